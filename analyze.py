@@ -0,0 +1,151 @@
+from position import Position
+from bot import ChessBot, MAX_DEPTH, mate_in
+from pgn import san_to_move
+from moves import move_to_uci
+from typing import Iterator
+import multiprocessing
+import argparse
+import json
+import time
+import os
+
+"""
+Batch analysis of EPD / FEN files with a process pool.
+
+Every line of the input is one position, either a FEN (all six fields) or an EPD line
+(four fields plus operations like 'bm Nf3; id "test 1";'). Each position is searched by
+a fresh ChessBot under the given depth / time / node limits, and one JSON object per
+position is written to the output (JSONL), in input order or as the results come in.
+
+The output file is also the checkpoint: every result is flushed as soon as it is written,
+and with --resume positions that already have a result are skipped.
+
+    python analyze.py positions.epd -o results.jsonl -p 8 --time 2 --resume
+"""
+
+
+DEFAULT_DEPTH = 4
+ANALYSIS_HASH_MB = 16
+
+
+def parse_epd(line: str) -> tuple[str, dict[str, str]]:
+    """
+    splits an EPD or FEN line into a FEN and the EPD operations ({'bm': 'Nf3', 'id': 'test 1'})
+    """
+    fields = line.split(maxsplit=4)
+    if len(fields) < 4:
+        raise ValueError(f"Not a FEN / EPD: {line.strip()}")
+    rest = fields[4] if len(fields) > 4 else ""
+
+    # a FEN has the two clocks after the en passant square
+    clocks = rest.split(maxsplit=2)
+    if len(clocks) >= 2 and clocks[0].isdigit() and clocks[1].isdigit():
+        return " ".join(fields[:4] + clocks[:2]), {}
+
+    operations = {}
+    for operation in rest.split(";"):
+        opcode, _, operand = operation.strip().partition(" ")
+        if opcode:
+            operations[opcode] = operand.strip().strip('"')
+    return " ".join(fields[:4]), operations
+
+
+def analyze_position(task: tuple[int, str, int, float | None, int | None, int]) -> dict:
+    """
+    pool task: searches one input line, returns its result (or its error) as dict
+    """
+    index, line, depth, time_limit, node_limit, hash_mb = task
+    result: dict = {"index": index}
+    try:
+        fen, operations = parse_epd(line)
+        position = Position(fen)
+        result["fen"] = position.position_to_fen()
+        if "id" in operations:
+            result["id"] = operations["id"]
+
+        bot = ChessBot(hash_mb)
+        start = time.perf_counter()
+        move = bot.find_best_move(position, depth, position.turn, time_limit, node_limit)
+        result.update({
+            "bestmove": move_to_uci(move) if move is not None else None,
+            "score": bot.score,
+            "mate": mate_in(bot.score),
+            "depth": bot.completed_depth,
+            "pv": [move_to_uci(m) for m in bot.pv],
+            "nodes": bot.nodes,
+            "time": round(time.perf_counter() - start, 3),
+        })
+
+        # test suites give the expected best moves in SAN
+        if "bm" in operations and move is not None:
+            result["bm"] = operations["bm"]
+            result["solved"] = move in [san_to_move(position, san) for san in operations["bm"].split()]
+    except Exception as error: # a broken line must not end a long run, it gets an error result instead
+        result["error"] = f"{type(error).__name__}: {error}"
+    return result
+
+
+
+def read_checkpoint(path: str) -> set[int]:
+    """
+    indices of the positions that already have a result in an output file. A line that was cut off
+    by a crash is removed from the file
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb+") as file:
+        data = file.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            file.truncate(complete)
+    return {json.loads(line)["index"] for line in data[:complete].splitlines() if line.strip()}
+
+
+def _tasks(input_path: str, done: set[int], depth: int, time_limit: float | None, node_limit: int | None,
+           hash_mb: int) -> Iterator[tuple]:
+    with open(input_path) as file:
+        for index, line in enumerate(file):
+            if line.strip() and not line.startswith("#") and index not in done:
+                yield index, line, depth, time_limit, node_limit, hash_mb
+
+
+def analyze_file(input_path: str, output_path: str, depth: int | None = None, time_limit: float | None = None,
+                 node_limit: int | None = None, processes: int | None = None, ordered: bool = True,
+                 resume: bool = False, hash_mb: int = ANALYSIS_HASH_MB) -> int:
+    """
+    analyzes every position of the input file (indexed by line number) and writes the results to
+    output_path. Without a depth, DEFAULT_DEPTH is used, or no depth limit if there is a time / node limit.
+    processes=None uses all cores. Returns the number of positions analyzed in this run
+    """
+    if depth is None:
+        depth = MAX_DEPTH if time_limit is not None or node_limit is not None else DEFAULT_DEPTH
+    done = read_checkpoint(output_path) if resume else set()
+
+    count = 0
+    with open(output_path, "a" if resume else "w") as output, multiprocessing.Pool(processes) as pool:
+        tasks = _tasks(input_path, done, depth, time_limit, node_limit, hash_mb)
+        results = pool.imap(analyze_position, tasks) if ordered else pool.imap_unordered(analyze_position, tasks)
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush() # every finished position is part of the checkpoint
+            count += 1
+    return count
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="analyze the positions of an EPD / FEN file")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file with one result per position")
+    parser.add_argument("-p", "--processes", type=int, default=None)
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--time", type=float, default=None, help="seconds per position")
+    parser.add_argument("--nodes", type=int, default=None, help="nodes per position")
+    parser.add_argument("--hash", type=int, default=ANALYSIS_HASH_MB, help="transposition table size in MB")
+    parser.add_argument("--unordered", action="store_true", help="write results as they come in")
+    parser.add_argument("--resume", action="store_true", help="skip positions that already have a result in the output")
+    args = parser.parse_args()
+
+    count = analyze_file(args.input, args.output, args.depth, args.time, args.nodes, args.processes,
+                         not args.unordered, args.resume, args.hash)
+    print(f"{count} positions analyzed")
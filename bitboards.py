@@ -0,0 +1,186 @@
+from schemas import ChessColor, Coordinate
+
+"""
+This File declares constants and small helpers for the bitboard representation of a Position.
+
+A bitboard is a plain python int where bit n is set if square n is taken.
+Squares are numbered like Position.board is laid out: index = y * 8 + x,
+so a8 is square 0, h8 is square 7 and h1 is square 63.
+"""
+
+
+# piece kinds, in the same order as the fen characters in PIECE_CHARS
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_CHARS = "pnbrqk"
+
+# colors are stored by their enum value, so they can index lists directly
+WHITE = ChessColor.WHITE.value
+BLACK = ChessColor.BLACK.value
+
+
+def make_piece(kind: int, color: int) -> int:
+    """
+    returns the piece code (0 - 11) for a piece kind and a color value.
+    black pieces are 0 - 5, white pieces are 6 - 11
+    """
+    return kind + 6 * color
+
+
+def piece_kind(piece: int) -> int:
+    return piece % 6
+
+
+def piece_color(piece: int) -> int:
+    return piece // 6
+
+
+def square_index(x: int, y: int) -> int:
+    return y * 8 + x
+
+
+def square_to_coordinate(square: int) -> Coordinate:
+    return Coordinate(x=square & 7, y=square >> 3)
+
+
+def lsb_index(bb: int) -> int:
+    """
+    index of the least significant set bit. bb must not be 0
+    """
+    return (bb & -bb).bit_length() - 1
+
+
+def squares_of(bb: int) -> list[int]:
+    """
+    returns the indices of all set bits. Meant for code outside of the search,
+    hot loops should pop the bits inline instead.
+    """
+    squares = []
+    while bb:
+        low = bb & -bb
+        squares.append(low.bit_length() - 1)
+        bb ^= low
+    return squares
+
+
+###############################################################################
+# Attack tables. Computed once at import time with plain ints, so the hot
+# loops never have to walk offsets square by square.
+###############################################################################
+
+def _leaper_attacks(offsets: tuple) -> list[int]:
+    table = []
+    for square in range(64):
+        x, y = square & 7, square >> 3
+        bb = 0
+        for dx, dy in offsets:
+            if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                bb |= 1 << ((y + dy) * 8 + x + dx)
+        table.append(bb)
+    return table
+
+
+knight_attacks = _leaper_attacks(((1, -2), (-1, -2), (2, -1), (2, 1), (1, 2), (-1, 2), (-2, -1), (-2, 1)))
+king_attacks = _leaper_attacks(((0, -1), (1, 0), (0, 1), (-1, 0), (1, -1), (-1, -1), (1, 1), (-1, 1)))
+
+# pawn_attacks[color][square]: squares a pawn of that color on that square attacks (white pawns move to lower y)
+pawn_attacks = [None, None]
+pawn_attacks[WHITE] = _leaper_attacks(((1, -1), (-1, -1)))
+pawn_attacks[BLACK] = _leaper_attacks(((1, 1), (-1, 1)))
+
+
+# ray directions. The first four step to higher square indices, the last four to lower ones
+SOUTH, EAST, SOUTH_EAST, SOUTH_WEST, NORTH, WEST, NORTH_WEST, NORTH_EAST = range(8)
+direction_offsets = ((0, 1), (1, 0), (1, 1), (-1, 1), (0, -1), (-1, 0), (-1, -1), (1, -1))
+
+def _ray_table(dx: int, dy: int) -> list[int]:
+    table = []
+    for square in range(64):
+        x, y, bb = (square & 7) + dx, (square >> 3) + dy, 0
+        while 0 <= x < 8 and 0 <= y < 8:
+            bb |= 1 << (y * 8 + x)
+            x, y = x + dx, y + dy
+        table.append(bb)
+    return table
+
+
+# rays[direction][square]: all squares from square (exclusive) to the edge of the board
+rays = [_ray_table(dx, dy) for dx, dy in direction_offsets]
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    """
+    squares a rook on 'square' attacks, including the first blocker in every direction
+    """
+    south, east, north, west = rays[SOUTH], rays[EAST], rays[NORTH], rays[WEST]
+
+    attacks = south[square]
+    blockers = attacks & occupied
+    if blockers:
+        attacks ^= south[(blockers & -blockers).bit_length() - 1]
+    bb = east[square]
+    blockers = bb & occupied
+    if blockers:
+        bb ^= east[(blockers & -blockers).bit_length() - 1]
+    attacks |= bb
+    bb = north[square]
+    blockers = bb & occupied
+    if blockers:
+        bb ^= north[blockers.bit_length() - 1]
+    attacks |= bb
+    bb = west[square]
+    blockers = bb & occupied
+    if blockers:
+        bb ^= west[blockers.bit_length() - 1]
+    return attacks | bb
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    """
+    squares a bishop on 'square' attacks, including the first blocker in every direction
+    """
+    south_east, south_west, north_west, north_east = rays[SOUTH_EAST], rays[SOUTH_WEST], rays[NORTH_WEST], rays[NORTH_EAST]
+
+    attacks = south_east[square]
+    blockers = attacks & occupied
+    if blockers:
+        attacks ^= south_east[(blockers & -blockers).bit_length() - 1]
+    bb = south_west[square]
+    blockers = bb & occupied
+    if blockers:
+        bb ^= south_west[(blockers & -blockers).bit_length() - 1]
+    attacks |= bb
+    bb = north_west[square]
+    blockers = bb & occupied
+    if blockers:
+        bb ^= north_west[blockers.bit_length() - 1]
+    attacks |= bb
+    bb = north_east[square]
+    blockers = bb & occupied
+    if blockers:
+        bb ^= north_east[blockers.bit_length() - 1]
+    return attacks | bb
+
+
+def _between_table() -> list[list[int]]:
+    table = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        for dx, dy in direction_offsets:
+            x, y, bb = (square & 7) + dx, (square >> 3) + dy, 0
+            while 0 <= x < 8 and 0 <= y < 8:
+                table[square][y * 8 + x] = bb
+                bb |= 1 << (y * 8 + x)
+                x, y = x + dx, y + dy
+    return table
+
+
+# between[a][b]: squares strictly between a and b if they share a rank, file or diagonal, else 0
+between = _between_table()
+
+# masks for ranks and files that move generation needs
+FULL_BOARD = (1 << 64) - 1
+FILE_A = sum(1 << (y * 8) for y in range(8))
+FILE_H = FILE_A << 7
+RANK_8 = 0xFF         # y == 0, where white pawns promote
+RANK_1 = 0xFF << 56   # y == 7, where black pawns promote
+RANK_3 = 0xFF << 40   # white pawns that may still double move land here after one step
+RANK_6 = 0xFF << 16   # same for black
@@ -0,0 +1,153 @@
+from position import Position
+from movegen import get_legal_moves
+from moves import move_to_uci
+from bitboards import PAWN, KING, WHITE, piece_kind, square_index
+from polyglot_keys import polyglot_random
+from utils import find_records
+import random
+import struct
+import mmap
+
+"""
+Reader for opening books in the Polyglot format (.bin).
+http://hgm.nubati.net/book_format.html
+
+A book is a file of 16 byte entries, sorted by key (all numbers big endian):
+    key (8 bytes)    - Polyglot hash of the position (not our zobrist hash, see polyglot_hash)
+    move (2 bytes)   - to file, to row, from file, from row (3 bits each), promotion piece (3 bits)
+    weight (2 bytes) - how good / how often played the move is
+    learn (4 bytes)  - unused
+
+The file is memory mapped and searched in place, so opening a book costs nothing, however big it is.
+"""
+
+ENTRY = struct.Struct(">QHHI")
+
+CASTLE_OFFSET = 768
+EN_PASSANT_OFFSET = 772
+TURN_OFFSET = 780
+
+# Polyglot writes castling as 'king takes own rook': book move -> (our move, king square, castling right)
+castling_moves = {"e1h1": ("e1g1", square_index(4, 7), 1), "e1a1": ("e1c1", square_index(4, 7), 2),
+                  "e8h8": ("e8g8", square_index(4, 0), 4), "e8a8": ("e8c8", square_index(4, 0), 8)}
+
+
+def polyglot_hash(position: Position) -> int:
+    """
+    Polyglot key of a position
+    """
+    key = 0
+    for square, piece in enumerate(position.squares):
+        if piece is not None:
+            # kind_of_piece: black pawn 0, white pawn 1, black knight 2... rows count from rank 1
+            kind_of_piece = 2 * (piece % 6) + piece // 6
+            key ^= polyglot_random[64 * kind_of_piece + (square ^ 56)]
+
+    # castling_rights uses the same bit order as Polyglot (white short, white long, black short, black long)
+    for right in range(4):
+        if position.castling_rights & (1 << right):
+            key ^= polyglot_random[CASTLE_OFFSET + right]
+
+    # the en passant file only counts if a pawn of the side to move stands next to the pawn that moved
+    ep = position.en_passant_square
+    if ep is not None:
+        color = position.turn.value
+        pawn_square = ep + 8 if color == WHITE else ep - 8
+        neighbours = [pawn_square + dx for dx in (-1, 1) if 0 <= (ep & 7) + dx < 8]
+        if any(position.squares[square] == PAWN + 6 * color for square in neighbours):
+            key ^= polyglot_random[EN_PASSANT_OFFSET + (ep & 7)]
+
+    if position.turn.value == WHITE:
+        key ^= polyglot_random[TURN_OFFSET]
+    return key
+
+
+def decode_book_move(book_move: int) -> str:
+    """
+    Polyglot move as UCI string. Castling stays 'king takes own rook', see castling_move()
+    """
+    files, promotions = "abcdefgh", " nbrq"
+    uci = (files[(book_move >> 6) & 7] + str(((book_move >> 9) & 7) + 1) +
+           files[book_move & 7] + str(((book_move >> 3) & 7) + 1) + promotions[(book_move >> 12) & 7].strip())
+    return uci
+
+
+def castling_move(position: Position, uci: str) -> str:
+    """
+    the UCI move of a decoded book move in the position: e1h1 is castling only if the king stands on e1
+    and may still castle that way, a rook can make the same move
+    """
+    if uci in castling_moves:
+        castling, king_square, right = castling_moves[uci]
+        piece = position.squares[king_square]
+        if piece is not None and piece_kind(piece) == KING and position.castling_rights & right:
+            return castling
+    return uci
+
+
+
+class OpeningBook():
+    """
+    A Polyglot book, memory mapped. Use it as context manager or call close() at the end.
+
+    selection: how choose() picks one of the book moves of a position,
+               "weighted" - at random, in proportion to the weights
+               "best"     - always the move with the highest weight
+    """
+
+    def __init__(self, path: str, selection: str = "weighted", seed: int | None = None) -> None:
+        if selection not in ("weighted", "best"):
+            raise ValueError(f"Unknown book move selection: {selection}")
+        self.selection = selection
+        self.random = random.Random(seed)
+
+        self.file = open(path, "rb")
+        size = self.file.seek(0, 2)
+        # an empty file can't be mapped, it is simply a book without entries
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.entry_count = size // ENTRY.size
+
+
+    def __enter__(self) -> "OpeningBook":
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+
+    def entries(self, key: int) -> list[tuple[int, int]]:
+        """
+        (move, weight) of all entries with the given key, in book order
+        """
+        return [(book_move, weight) for _, book_move, weight, _ in find_records(self.data, ENTRY, key, 0, self.entry_count)]
+
+
+    def moves(self, position: Position) -> list[tuple[int, int]]:
+        """
+        (move, weight) of the book moves of a position, as legal moves of our move format.
+        Entries that aren't legal in the position (e.g. key collisions) are left out
+        """
+        legal = {move_to_uci(move): move for move in get_legal_moves(position, position.turn)}
+        return [(legal[uci], weight) for uci, weight in
+                ((castling_move(position, decode_book_move(book_move)), weight)
+                 for book_move, weight in self.entries(polyglot_hash(position)))
+                if uci in legal]
+
+
+    def choose(self, position: Position) -> int | None:
+        """
+        a book move for the position (see selection), None if the position is not in the book
+        """
+        moves = [(move, weight) for move, weight in self.moves(position) if weight > 0]
+        if not moves:
+            return None
+        if self.selection == "best":
+            return max(moves, key=lambda entry: entry[1])[0]
+        return self.random.choices([move for move, _ in moves], weights=[weight for _, weight in moves])[0]
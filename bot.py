@@ -1,95 +1,775 @@
 from evaluation import evaluate_position
 from position import Position
-from schemas import ChessColor, ChessMove
-from movegen import generate_moves
+from schemas import ChessColor, SearchInfo
+from movegen import get_legal_moves, get_legal_captures, get_legal_quiets, get_check_info, is_legal_move, see
+from moves import CAPTURE, EN_PASSANT, PROMOTION_SHIFT
+from bitboards import PAWN, QUEEN, KING
+from psqt import kind_values
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from book import OpeningBook
+from typing import Callable
+import threading
+import time
+import math
+import copy
 
 """
-Implementation of a chess bot using minimax-algorithm and simple board evaluation
+Implementation of a chess bot using alpha-beta search (negamax with principal variation search)
+and simple board evaluation.
+
+Scores are integers in centipawns from the point of view of the side to move.
+Mates are scored as MATE_SCORE minus the number of plies until mate, see mate_in().
+
+The search writes nothing to stdout. Counters are collected in ChessBot.stats (see SearchStats),
+and find_best_move can report every finished iteration to a callback.
 """
 
+# maximum search depth of find_best_move
+MAX_DEPTH = 64
+
+# part of the time limit after which no new iteration is started
+SOFT_TIME_RATIO = 0.5
+
+# nodes between two looks at ChessBot.stop_event
+STOP_EVENT_INTERVAL = 1024
+
+# seconds between two looks at the ponder search, while waiting for it to take over a ponderhit / miss
+PONDER_POLL_INTERVAL = 0.01
+
+# mate scores. Scores beyond MATE_THRESHOLD are mates, INFINITY is outside of every real score
+MATE_SCORE = 100_000
+MATE_THRESHOLD = MATE_SCORE - 1_000
+INFINITY = MATE_SCORE + 1
+
+# aspiration windows: from this depth on, an iteration starts with a window of
+# ASPIRATION_WINDOW around the score of the last one, widened after every fail
+ASPIRATION_MIN_DEPTH = 4
+ASPIRATION_WINDOW = 50
+
+# move ordering scores, higher is searched first. Quiet moves without
+# a killer / counter bonus are ordered by their history score below HISTORY_MAX
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 26 # + 8 * victim kind - attacker kind (MVV-LVA)
+KILLER_SCORE = 1 << 25
+COUNTER_MOVE_SCORE = KILLER_SCORE - 2
+HISTORY_MAX = 1 << 24
+LOSING_CAPTURE_SCORE = -(1 << 25) # + MVV-LVA, captures that lose material according to see()
+
+# null move pruning: a position where passing still fails high is pruned,
+# searched with a depth reduced by 2, or by 3 above NULL_MOVE_R3_DEPTH (adaptive null move pruning)
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_R3_DEPTH = 6
+
+# late move reductions: quiet moves searched late get a reduced depth, LMR_MIN_DEPTH and LMR_MIN_MOVES
+# are the first depth and move index that are reduced. lmr_reductions[depth][move index]
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+lmr_reductions = [
+    [0 if depth == 0 or index == 0 else int(0.75 + math.log(depth) * math.log(index) / 2.25) for index in range(64)]
+    for depth in range(MAX_DEPTH + 1)
+]
+
+# reverse futility pruning: up to RFP_DEPTH, a node whose static evaluation beats beta by RFP_MARGIN * depth is cut
+RFP_DEPTH = 3
+RFP_MARGIN = 120
+
+# futility pruning: quiet moves are skipped if the static evaluation plus futility_margins[depth] can't reach alpha
+futility_margins = [0, 200, 400]
+
+# quiescence search skips a capture if winning the victim plus this margin still can't reach alpha / beta
+DELTA_MARGIN = 200
+
+# close to the leaves, negamax skips captures that lose more than SEE_PRUNING_MARGIN * depth
+SEE_PRUNING_DEPTH = 2
+SEE_PRUNING_MARGIN = 100
+
+
+def mvv_lva(squares: list[int | None], move: int) -> int:
+    """
+    most valuable victim - least valuable attacker: 8 * victim kind - attacker kind.
+    A promotion counts like capturing the piece it promotes to
+    """
+    victim = squares[(move >> 6) & 63] % 6 if move & CAPTURE and not move & EN_PASSANT else 0
+    return 8 * (victim + (move >> PROMOTION_SHIFT)) - squares[move & 63] % 6
+
+
+def mate_in(score: int) -> int | None:
+    """
+    number of moves (not plies) until mate for a mate score, negative if the side to move gets mated.
+    None if the score is not a mate score
+    """
+    if score >= MATE_THRESHOLD:
+        return (MATE_SCORE - score + 1) // 2
+    if score <= -MATE_THRESHOLD:
+        return -((MATE_SCORE + score) // 2)
+    return None
+
+
+def score_to_tt(score: int, ply: int) -> int:
+    """
+    mate scores are stored relative to the stored position, not to the root of the search
+    """
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_tt(score: int, ply: int) -> int:
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def is_losing_capture(position: Position, move: int, margin: int = 0) -> bool:
+    """
+    True if the capture loses more than 'margin' according to the static exchange evaluation.
+    Taking a piece at least as valuable as the capturing one can't lose, see() is skipped for those
+    """
+    squares = position.squares
+    attacker = squares[move & 63] % 6
+    victim = PAWN if move & EN_PASSANT else squares[(move >> 6) & 63] % 6
+    if kind_values[attacker] <= kind_values[victim]:
+        return False
+    return see(position, move) < -margin
+
+
+class SearchStats():
+    """
+    counters of one find_best_move call
+    """
+
+    def __init__(self) -> None:
+        self.nodes = 0
+        self.qnodes = 0 # part of the nodes that were searched by quiescence()
+        self.cutoffs = 0 # beta cutoffs in negamax
+        self.first_move_cutoffs = 0 # ... by the first move searched (a measure of the move ordering)
+        self.tt_cutoffs = 0 # nodes answered by the transposition table
+        self.null_move_cutoffs = 0
+        self.depth_times: list[float] = [] # seconds since the start, when each iteration finished
+
+
+    def first_move_cutoff_rate(self) -> float:
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+
+    def as_dict(self) -> dict:
+        return {
+            "nodes": self.nodes,
+            "qnodes": self.qnodes,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoff_rate(),
+            "tt_cutoffs": self.tt_cutoffs,
+            "null_move_cutoffs": self.null_move_cutoffs,
+            "depth_times": self.depth_times
+        }
+
+
+
 class ChessBot():
 
-    def minimax(self, position: Position, depth: int, maximizing: bool, color: ChessColor, alpha: float, beta: float):
+    def __init__(self, hash_mb: int = 16, null_move: bool = True, lmr: bool = True, futility: bool = True,
+                 tt: TranspositionTable | None = None, book: OpeningBook | None = None) -> None:
+        # transposition table, kept between calls of find_best_move. A given table (e.g. a shared one) replaces hash_mb
+        self.tt = tt if tt is not None else TranspositionTable(hash_mb)
+
+        # opening book, its moves are played without searching
+        self.book = book
+
+        # selective search features, each can be switched off (e.g. for benchmarks)
+        self.null_move = null_move # null move pruning
+        self.lmr = lmr # late move reductions
+        self.futility = futility # reverse futility and futility pruning
+
+        # search limits and counters, set up by find_best_move
+        self.stats = SearchStats()
+        self.node_limit = float('inf')
+        self.hard_deadline = float('inf')
+        self.soft_deadline = float('inf')
+        self.stop = False
+        self.stop_event = None # e.g. a multiprocessing.Event, polled every STOP_EVENT_INTERVAL nodes
+
+        # result of the last finished iteration: score and principal variation (best line)
+        self.score = 0
+        self.pv: list[int] = []
+        self.completed_depth = 0
+        self.pv_table = [[] for _ in range(MAX_DEPTH + 2)] # pv_table[ply]: best line found from that ply on
+
+        # move ordering heuristics, see order_moves()
+        self.root_ply = 0
+        self.killers = [[0, 0] for _ in range(MAX_DEPTH + 1)] # two quiet moves per ply that caused a cutoff
+        self.history = [0] * (2 * 4096) # butterfly table, indexed by color * 4096 + origin | target << 6
+        self.counter_moves = [0] * 4096 # quiet move that refuted a move, indexed like the history
+
+        # pondering, see start_pondering()
+        self.ponder_move = 0 # expected reply of the opponent, 0 if not pondering
+        self.ponder_thread: threading.Thread | None = None
+        self.ponder_result: int | None = None
+
+
+    @property
+    def nodes(self) -> int:
+        return self.stats.nodes
+
+
+    @property
+    def qnodes(self) -> int:
+        return self.stats.qnodes
+
+
+    def order_moves(self, position: Position, moves: list[int], hash_move: int, ply: int, color: int) -> list[int]:
+        """
+        sorts the moves for the search without playing them:
+        hash move, captures by MVV-LVA (promotions in between), killers of this ply,
+        the counter move of the previous move, the remaining quiet moves by history score
+        and finally the captures that lose material
+        https://www.chessprogramming.org/Move_Ordering
+        """
+        squares = position.squares
+        killer_1, killer_2 = self.killers[ply]
+        history = self.history
+        base = color * 4096
+        last_move = position.last_move()
+        counter_move = self.counter_moves[last_move & 4095] if last_move else 0
+
+        def score(move: int) -> int:
+            if move == hash_move:
+                return HASH_MOVE_SCORE
+            if move & CAPTURE or move >> PROMOTION_SHIFT:
+                if move & CAPTURE and is_losing_capture(position, move):
+                    return LOSING_CAPTURE_SCORE + mvv_lva(squares, move)
+                return CAPTURE_SCORE + mvv_lva(squares, move)
+            if move == killer_1:
+                return KILLER_SCORE
+            if move == killer_2:
+                return KILLER_SCORE - 1
+            if move == counter_move:
+                return COUNTER_MOVE_SCORE
+            return history[base + (move & 4095)]
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+
+    def pick_moves(self, position: Position, color: ChessColor, hash_move: int, ply: int):
+        """
+        staged move picker for minimax. Yields the moves in the same order as order_moves(),
+        but every stage is only generated when the previous one is used up, so the work for
+        the later stages is saved whenever a move causes a cutoff:
+            1. hash move (if it is legal here)
+            2. captures and promotions that don't lose material, by MVV-LVA
+            3. killer moves of this ply and the counter move of the previous move
+            4. the remaining quiet moves by history score
+            5. losing captures
+        https://www.chessprogramming.org/Move_Generation#Staged_Move_Generation
+        """
+        # checkers and pins are the same for every stage
+        check_info = get_check_info(position, color)
+        if hash_move and is_legal_move(position, color, hash_move, check_info):
+            yield hash_move
+        else:
+            hash_move = 0
+
+        squares = position.squares
+        captures = get_legal_captures(position, color, check_info)
+        captures.sort(key=lambda m: mvv_lva(squares, m), reverse=True)
+        losing_captures = []
+        for move in captures:
+            if move == hash_move:
+                continue
+            if move & CAPTURE and is_losing_capture(position, move):
+                losing_captures.append(move)
+                continue
+            yield move
+
+        quiets = get_legal_quiets(position, color, check_info)
+        last_move = position.last_move()
+        counter_move = self.counter_moves[last_move & 4095] if last_move else 0
+        searched = [hash_move]
+        for move in (*self.killers[ply], counter_move):
+            if move and move not in searched and move in quiets:
+                searched.append(move)
+                yield move
+
+        history, base = self.history, color.value * 4096
+        quiets.sort(key=lambda m: history[base + (m & 4095)], reverse=True)
+        for move in quiets:
+            if move not in searched:
+                yield move
+
+        yield from losing_captures
+
+
+    def update_heuristics(self, position: Position, move: int, depth: int, ply: int, color: int) -> None:
+        """
+        remembers a quiet move that caused a cutoff as killer, counter move and in the history table
+        """
+        if move & CAPTURE or move >> PROMOTION_SHIFT:
+            return
+
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        last_move = position.last_move()
+        if last_move:
+            self.counter_moves[last_move & 4095] = move
+
+        index = color * 4096 + (move & 4095)
+        self.history[index] += depth * depth
+        if self.history[index] >= HISTORY_MAX:
+            self.age_history()
+
+
+    def age_history(self) -> None:
+        """
+        halves all history scores, so old results lose weight against new ones
+        """
+        self.history = [value // 2 for value in self.history]
+
+
+    def evaluate(self, position: Position) -> int:
+        """
+        static evaluation from the point of view of the side to move
+        """
+        score = evaluate_position(position)
+        return score if position.turn == ChessColor.WHITE else -score
+
+
+    def check_limits(self) -> bool:
+        """
+        counts a node and returns True if the search has to stop
+        """
+        stats = self.stats
+        stats.nodes += 1
+        if stats.nodes >= self.node_limit or time.perf_counter() >= self.hard_deadline:
+            self.stop = True
+        elif self.stop_event is not None and not stats.nodes % STOP_EVENT_INTERVAL and self.stop_event.is_set():
+            self.stop = True
+        return self.stop
+
+
+    def quiescence(self, position: Position, alpha: int, beta: int) -> int:
         """
-        implementation of the recursive minimax-algorithm
-        see https://de.wikipedia.org/wiki/Minimax-Algorithmus for additional information
+        searches captures and promotions only, until the position is quiet, so positions are
+        not evaluated in the middle of an exchange (horizon effect)
+        https://www.chessprogramming.org/Quiescence_Search
+
+        The side to move may 'stand pat' and take the static evaluation instead of capturing.
+        Captures that can't reach alpha even with DELTA_MARGIN (delta pruning) and
+        losing captures (see is_losing_capture) are skipped. In check all evasions are searched.
         """
+        # quiescence nodes count towards the same limits
+        self.stats.qnodes += 1
+        if self.check_limits():
+            return 0
+
+        color = position.turn
+        in_check = position.in_check(color.value)
         try:
-            moves = generate_moves(position, color)
-        except ValueError:
-            print("No King left!")
-            return evaluate_position(position)
-
-        # stop recursion
-        if depth == 0 or not moves or len(moves) == 0: # no legal moves left or search depth reached
-            return evaluate_position(position)
-        
-        # switch color for recursive call
-        next_color = ChessColor.BLACK if color == ChessColor.WHITE else ChessColor.WHITE
-
-
-        # recursive calls
-        # maximizer: search best move for white
-        if maximizing:
-            max_eval = float('-inf')
-            for move in moves:
-                captured_piece = position.move(move)
-                new_eval = self.minimax(position, depth - 1, False, next_color, alpha, beta)
-                position.undo_move(move, captured_piece)
-                max_eval = max(max_eval, new_eval)
-                alpha = max(alpha, new_eval)
-                if beta <= alpha:
-                    break # beta cutoff
-            return max_eval
-
-        # minimizer: search best move for black
+            moves = get_legal_moves(position, color) if in_check else get_legal_captures(position, color)
+        except ValueError: # no king left
+            return self.evaluate(position)
+
+        if in_check:
+            if not moves:
+                return -MATE_SCORE + position.ply - self.root_ply
+            stand_pat = best_score = -INFINITY
+        else:
+            stand_pat = best_score = self.evaluate(position)
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+
+        squares = position.squares
+        moves.sort(key=lambda m: mvv_lva(squares, m), reverse=True)
+
+        for move in moves:
+            if not in_check:
+                promotion = move >> PROMOTION_SHIFT
+                if promotion and promotion != QUEEN:
+                    continue # underpromotions are never better here
+
+                # delta pruning
+                gain = 0
+                if move & CAPTURE:
+                    gain = kind_values[PAWN] if move & EN_PASSANT else kind_values[squares[(move >> 6) & 63] % 6]
+                if promotion:
+                    gain += kind_values[QUEEN] - kind_values[PAWN]
+                if stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
+
+                if move & CAPTURE and is_losing_capture(position, move):
+                    continue
+
+            position.move(move)
+            score = -self.quiescence(position, -beta, -alpha)
+            position.undo_move(move)
+            if self.stop:
+                return 0
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+
+    def negamax(self, position: Position, depth: int, alpha: int, beta: int, allow_null: bool = True) -> int:
+        """
+        alpha-beta search in negamax form with principal variation search (PVS):
+        the first move is searched with the full window, all others with a zero window
+        (alpha, alpha + 1) that only proves they are not better. A move that fails high
+        is searched again with the full window.
+        https://www.chessprogramming.org/Principal_Variation_Search
+
+        Outside of the principal variation the search is selective (see the options of ChessBot):
+        reverse futility pruning and null move pruning cut whole nodes, futility pruning skips
+        quiet moves near the leaves, late move reductions search late quiet moves less deep.
+
+        The best line is collected in pv_table[ply].
+        """
+        # search depth reached, continue with captures only
+        if depth <= 0:
+            return self.quiescence(position, alpha, beta)
+
+        ply = position.ply - self.root_ply
+        self.pv_table[ply] = []
+        if self.check_limits():
+            return 0
+
+        color = position.turn
+        if not position.bitboards[color.value * 6 + KING]: # no king left
+            return self.evaluate(position)
+
+        alpha_orig = alpha
+        pv_node = beta - alpha > 1
+
+        # transposition table lookup. PV nodes are searched anyway, so their line stays complete
+        hash_move = 0
+        entry = self.tt.probe(position.hash)
+        if entry is not None:
+            tt_depth, tt_bound, tt_score, hash_move = entry
+            tt_score = score_from_tt(tt_score, ply)
+            if tt_depth >= depth and not pv_node and (tt_bound == EXACT or
+                    (tt_bound == LOWER and tt_score >= beta) or (tt_bound == UPPER and tt_score <= alpha)):
+                self.stats.tt_cutoffs += 1
+                return tt_score
+
+        in_check = position.in_check(color.value)
+        selective = not pv_node and not in_check
+        static_eval = self.evaluate(position) if selective else 0
+
+        # reverse futility pruning: far above beta close to the leaves, assume it stays that way
+        if self.futility and selective and depth <= RFP_DEPTH and abs(beta) < MATE_THRESHOLD \
+                and static_eval - RFP_MARGIN * depth >= beta:
+            return static_eval
+
+        # null move pruning: if passing still fails high, a real move would as well.
+        # Not with only pawns left, where passing would often be the best move (zugzwang)
+        if self.null_move and selective and allow_null and depth >= NULL_MOVE_MIN_DEPTH and static_eval >= beta:
+            base = color.value * 6
+            if position.occupancy[color.value] ^ position.bitboards[base + PAWN] ^ position.bitboards[base + KING]:
+                reduction = 3 if depth > NULL_MOVE_R3_DEPTH else 2
+                position.move_null()
+                score = -self.negamax(position, depth - 1 - reduction, -beta, -beta + 1, False)
+                position.undo_null_move()
+                if self.stop:
+                    return 0
+                if score >= beta:
+                    self.stats.null_move_cutoffs += 1
+                    return beta if score >= MATE_THRESHOLD else score # unproven mates are not returned
+
+        # bad captures close to the leaves are not worth searching (the first move is always searched)
+        prune_captures = depth <= SEE_PRUNING_DEPTH and not in_check
+        see_margin = SEE_PRUNING_MARGIN * depth
+
+        # futility pruning: quiet moves that don't give check can't raise the score to alpha
+        futile = self.futility and selective and depth < len(futility_margins) and abs(alpha) < MATE_THRESHOLD \
+            and static_eval + futility_margins[depth] <= alpha
+
+        killers = self.killers[ply]
+        history, history_base = self.history, color.value * 4096
+        best_score, best_move = -INFINITY, 0
+        moves_searched = 0
+        for move in self.pick_moves(position, color, hash_move, ply):
+            if prune_captures and best_move and move & CAPTURE and is_losing_capture(position, move, see_margin):
+                continue
+
+            quiet = not (move & CAPTURE or move >> PROMOTION_SHIFT)
+            position.move(move)
+            gives_check = (futile or self.lmr) and quiet and best_move and position.in_check(position.turn.value)
+            if futile and quiet and best_move and not gives_check:
+                position.undo_move(move)
+                continue
+
+            if not best_move:
+                score = -self.negamax(position, depth - 1, -beta, -alpha)
+            else:
+                # late move reduction, less for moves with a good history and in the principal variation
+                reduction = 0
+                if self.lmr and quiet and depth >= LMR_MIN_DEPTH and moves_searched >= LMR_MIN_MOVES \
+                        and not in_check and not gives_check and move not in killers:
+                    reduction = lmr_reductions[depth][min(moves_searched, 63)]
+                    if pv_node:
+                        reduction -= 1
+                    if history[history_base + (move & 4095)] > HISTORY_MAX // 64:
+                        reduction -= 1
+                    reduction = max(0, min(reduction, depth - 2))
+
+                score = -self.negamax(position, depth - 1 - reduction, -alpha - 1, -alpha)
+                if reduction and score > alpha:
+                    score = -self.negamax(position, depth - 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self.negamax(position, depth - 1, -beta, -alpha)
+            position.undo_move(move)
+            moves_searched += 1
+            if self.stop:
+                return 0
+
+            if score > best_score or not best_move:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1] if depth > 1 else [move]
+                    if alpha >= beta:
+                        self.stats.cutoffs += 1
+                        if moves_searched == 1:
+                            self.stats.first_move_cutoffs += 1
+                        self.update_heuristics(position, move, depth, ply, color.value)
+                        break
+
+        if not best_move: # no legal moves: mate or stalemate
+            return -MATE_SCORE + ply if in_check else 0
+
+        # store result
+        if best_score <= alpha_orig:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
         else:
-            min_eval = float('inf')
-            for move in moves:
-                captured_piece = position.move(move)
-                new_eval = self.minimax(position, depth - 1, True, next_color, alpha, beta)
-                position.undo_move(move, captured_piece)
-                min_eval = min(min_eval, new_eval)
-                beta = min(beta, min_eval)
-                if beta <= alpha:
-                    break # alpha cutoff
-            return min_eval
+            bound = EXACT
+        self.tt.store(position.hash, depth, bound, score_to_tt(best_score, ply), best_move)
+        return best_score
 
 
 
 
-    def find_best_move(self, position: Position, depth: int, color: ChessColor) -> ChessMove:
+    def search_root(self, position: Position, depth: int, moves: list[int], alpha: int, beta: int) -> tuple[int, int | None]:
         """
-        root search function. calls minimax and returns best found move respective to depth
+        searches all root moves to the given depth with PVS inside the window (alpha, beta).
+        Returns the best score and move. If the search gets stopped, the best move among the
+        completely searched root moves is returned (None if there is none)
+        """
+        best_score, best_move = -INFINITY, None
+        self.pv_table[0] = []
+
+        for move in moves:
+            position.move(move)
+            if best_move is None:
+                score = -self.negamax(position, depth - 1, -beta, -alpha)
+            else:
+                score = -self.negamax(position, depth - 1, -alpha - 1, -alpha)
+                if alpha < score < beta and not self.stop:
+                    score = -self.negamax(position, depth - 1, -beta, -alpha)
+            position.undo_move(move)
+            if self.stop:
+                break # result of this move is incomplete
+
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[0] = [move] + self.pv_table[1] if depth > 1 else [move]
+                    if alpha >= beta:
+                        break
+
+        return best_score, best_move
+
+
+
+
+    def find_best_move(self, position: Position, depth: int, color: ChessColor, time_limit: float | None = None, node_limit: int | None = None,
+                       start_depth: int = 1, callback: Callable[[SearchInfo], None] | None = None) -> int | None:
+        """
+        root search function. Uses iterative deepening: searches depth 1, 2, 3... up to 'depth'
+        and returns the best move of the last finished iteration (as int, see moves.to_chess_move),
+        or None if there is no legal move. A move of an unfinished iteration that already beat the
+        previous best one (stopped search, aspiration fail high) replaces it. The score and principal
+        variation of the returned move are kept in self.score and self.pv (self.pv[0] is always the
+        returned move). 'color' has to be the side to move of the position.
+        Positions in the opening book (self.book) are answered with a book move right away.
+
+        From ASPIRATION_MIN_DEPTH on, every iteration first searches a small window around the
+        score of the previous one, and only widens it if the score falls outside.
+
+        time_limit: seconds the search may take. No new iteration is started after
+                    SOFT_TIME_RATIO of it, and a running one is stopped when it runs out
+        node_limit: stops the search after this many nodes
+        start_depth: first iteration (helpers of the parallel search start deeper, see smp.py)
+        callback: called with a SearchInfo after every finished iteration
         """
         # input validation
-        MAX_DEPTH = 7
         if not (0 <= depth <= MAX_DEPTH):
             raise ValueError(f"Search depth has to be in range 0 to {MAX_DEPTH}")
 
-        best_eval = float('-inf') if color == ChessColor.WHITE else float('inf')
-        next_color = ChessColor.BLACK if color == ChessColor.WHITE else ChessColor.WHITE
-        maximizing = True if next_color == ChessColor.WHITE else False
-        alpha, beta = float('-inf'), float('inf')
+        self.tt.new_search()
+        self.tt.reset_stats()
+        self.stats = SearchStats()
+        self.stop = False
+        start = time.perf_counter()
+        self.set_time_limit(time_limit, start)
+        self.node_limit = node_limit if node_limit is not None else float('inf')
 
-        best_move = None
-        moves = generate_moves(position, color)
+        moves = get_legal_moves(position, color)
+        if not moves:
+            return None
+
+        if self.book is not None:
+            book_move = self.book.choose(position)
+            if book_move is not None:
+                self.score, self.pv, self.completed_depth = 0, [book_move], 0
+                return book_move
+
+        # fresh killers for the new root, older history counts less
+        self.root_ply = position.ply
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        self.age_history()
+
+        entry = self.tt.probe(position.hash)
+        moves = self.order_moves(position, moves, entry[3] if entry is not None else 0, 0, color.value)
+        best_move, best_score = moves[0], 0
+        self.score, self.pv = 0, [best_move]
+
+        self.completed_depth = 0
+        for current_depth in range(min(start_depth, max(depth, 1)), max(depth, 1) + 1):
+            window = ASPIRATION_WINDOW
+            if current_depth >= ASPIRATION_MIN_DEPTH and abs(best_score) < MATE_THRESHOLD:
+                alpha, beta = best_score - window, best_score + window
+            else:
+                alpha, beta = -INFINITY, INFINITY
+
+            while True:
+                score, move = self.search_root(position, current_depth, moves, alpha, beta)
+                if self.stop:
+                    # a move that was proven better than alpha is still an improvement
+                    if move is not None and score > alpha:
+                        best_move = move
+                        self.keep_root_result(score, move)
+                    break
+                if score <= alpha:
+                    alpha = max(alpha - window, -INFINITY)
+                elif score >= beta:
+                    best_move = move
+                    self.keep_root_result(score, move)
+                    beta = min(beta + window, INFINITY)
+                else:
+                    best_move, best_score = move, score
+                    break
+                window *= 2
+            if self.stop:
+                break
+
+            self.score, self.pv = best_score, self.pv_table[0]
+            self.completed_depth = current_depth
+            self.tt.store(position.hash, current_depth, EXACT, best_score, best_move)
+            elapsed = time.perf_counter() - start
+            self.stats.depth_times.append(elapsed)
+            if callback is not None:
+                nps = int(self.stats.nodes / elapsed) if elapsed > 0 else 0
+                callback(SearchInfo(current_depth, best_score, self.stats.nodes, nps, list(self.pv), self.tt.hashfull(), elapsed))
+            if start + elapsed >= self.soft_deadline:
+                break
+
+            # search the best move of this iteration first in the next one
+            moves.remove(best_move)
+            moves.insert(0, best_move)
 
-        for move in moves:
-            captured_piece = position.move(move)
-            new_eval = self.minimax(position, depth - 1, maximizing, next_color, alpha, beta)
-            position.undo_move(move, captured_piece)
-
-            if color == ChessColor.WHITE and new_eval > best_eval:
-                best_eval, best_move = new_eval, move
-                alpha = max(alpha, new_eval)
-            elif color == ChessColor.BLACK and new_eval < best_eval:
-                best_eval, best_move = new_eval, move
-                beta = min(beta, new_eval)
-            print(best_eval)
         return best_move
-                
 
-            
 
+    def keep_root_result(self, score: int, move: int) -> None:
+        """
+        takes a root move of an unfinished iteration as the result: score (a lower bound) and line
+        of it go to self.score and self.pv, so they always belong to the move that is returned
+        """
+        line = self.pv_table[0]
+        self.score, self.pv = score, list(line) if line[:1] == [move] else [move]
+
+
+    def set_time_limit(self, time_limit: float | None, start: float | None = None) -> None:
+        """
+        sets the deadlines of the search (see find_best_move), counted from start (default: now).
+        May be called from another thread while find_best_move runs, e.g. on a ponderhit
+        """
+        start = start if start is not None else time.perf_counter()
+        self.hard_deadline = start + time_limit if time_limit is not None else float('inf')
+        self.soft_deadline = start + time_limit * SOFT_TIME_RATIO if time_limit is not None else float('inf')
 
+
+    def start_pondering(self, position: Position, move: int | None = None) -> int | None:
+        """
+        keeps thinking on the opponent's time: searches the position after the expected reply
+        'move' in a background thread, without limits. 'position' is the position after our own move,
+        it is not changed. By default the reply is the second move of the last principal variation,
+        if its first move is the one that led to 'position'.
+
+        Returns the expected reply, None if there is none. Pondering has to be ended with
+        ponder_hit() if the opponent played it, or ponder_miss() otherwise.
+        """
+        if move is None:
+            move = self.pv[1] if len(self.pv) > 1 and self.pv[0] == position.last_move() else 0
+        if not move or move not in get_legal_moves(position, position.turn):
+            return None
+
+        ponder_position = copy.deepcopy(position)
+        ponder_position.move(move)
+        self.ponder_move, self.ponder_result = move, None
+
+        def search() -> None:
+            self.ponder_result = self.find_best_move(ponder_position, MAX_DEPTH, ponder_position.turn)
+
+        self.ponder_thread = threading.Thread(target=search, daemon=True)
+        self.ponder_thread.start()
+        return move
+
+
+    def ponder_hit(self, time_limit: float) -> int | None:
+        """
+        the expected reply was played: the ponder search goes on as the normal search, with
+        time_limit seconds from now. Its finished iterations and tables are kept. Returns its best move.
+        A limit is required, a search without one would go on to MAX_DEPTH and block the caller
+        """
+        start = time.perf_counter()
+        self._end_pondering(lambda: self.set_time_limit(time_limit, start))
+        return self.ponder_result
+
+
+    def ponder_miss(self) -> None:
+        """
+        another move was played: stops the ponder search. What it stored in the table stays useful
+        """
+        def abort() -> None:
+            self.stop = True
+        self._end_pondering(abort)
+
+
+    def _end_pondering(self, action: Callable[[], None]) -> None:
+        """
+        applies action to the ponder search until it is done. Repeated, because the search thread
+        may not have set up its own limits yet
+        """
+        if self.ponder_thread is not None:
+            while self.ponder_thread.is_alive():
+                action()
+                self.ponder_thread.join(PONDER_POLL_INTERVAL)
+        self.ponder_thread = None
+        self.ponder_move = 0
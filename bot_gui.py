@@ -2,10 +2,11 @@ import pygame
 import os
 import time
 from position import Position
-from movegen import get_pseudo_legal_moves, filter_legal_moves
+from movegen import get_legal_moves
 from schemas import ChessColor
+from moves import to_chess_move, from_chess_move, move_origin
 from evaluation import evaluate_position
-from bot import ChessBot
+from bot import ChessBot, MAX_DEPTH
 
 # Constants
 BOARD_SIZE = 640
@@ -146,7 +147,8 @@ def main():
     piece_map = {'Pawn': 'P', 'Knight': 'N', 'Bishop': 'B', 'Rook': 'R', 'Queen': 'Q', 'King': 'K'}
 
     bot = ChessBot()
-    BOT_DEPTH = 2
+    BOT_TIME = 3.0 # seconds the bot may think per move
+    player_move = 0
 
     move_num = 0
 
@@ -165,7 +167,8 @@ def main():
                         for move in legal_moves:
                             if move.target.x == bx and move.target.y == by:
                                 animate_move(win, images, position, move, piece_map, font)
-                                position.move(move)
+                                player_move = from_chess_move(move, position)
+                                position.move(player_move)
                                 move_num += 1
                                 score = evaluate_position(position)
                                 print("Player evaluation:", score)
@@ -177,18 +180,14 @@ def main():
                         else:
                             if piece and piece.color == turn:
                                 selected = (bx, by)
-                                pseudo_moves = get_pseudo_legal_moves(position, turn)
-                                filtered_moves = [m for m in pseudo_moves if m.origin.x == bx and m.origin.y == by]
-                                legal_moves = filter_legal_moves(position, turn, filtered_moves)
+                                legal_moves = [to_chess_move(m, turn) for m in get_legal_moves(position, turn) if move_origin(m) == by * 8 + bx]
                             else:
                                 selected = None
                                 legal_moves = []
                     else:
                         if piece and piece.color == turn:
                             selected = (bx, by)
-                            pseudo_moves = get_pseudo_legal_moves(position, turn)
-                            filtered_moves = [m for m in pseudo_moves if m.origin.x == bx and m.origin.y == by]
-                            legal_moves = filter_legal_moves(position, turn, filtered_moves)
+                            legal_moves = [to_chess_move(m, turn) for m in get_legal_moves(position, turn) if move_origin(m) == by * 8 + bx]
                         else:
                             selected = None
                             legal_moves = []
@@ -202,17 +201,23 @@ def main():
         if turn == ChessColor.BLACK:
             pygame.time.delay(300)
             if move_num >= 50:
-                #BOT_DEPTH = 3
+                #BOT_TIME = 5.0
                 pass
-            bot_move = bot.find_best_move(position, BOT_DEPTH, ChessColor.BLACK)
+            # the bot pondered on the reply it expected, if the player chose it the search simply goes on
+            if bot.ponder_move and bot.ponder_move == player_move:
+                bot_move = bot.ponder_hit(BOT_TIME)
+            else:
+                bot.ponder_miss()
+                bot_move = bot.find_best_move(position, MAX_DEPTH, ChessColor.BLACK, time_limit=BOT_TIME)
             if bot_move:
-                animate_move(win, images, position, bot_move, piece_map, font)
+                animate_move(win, images, position, to_chess_move(bot_move, ChessColor.BLACK), piece_map, font)
                 position.move(bot_move)
-                print(f"bot move for depth {BOT_DEPTH}")
+                print(f"bot move after searching {bot.nodes} nodes")
                 move_num += 1
                 score = evaluate_position(position)
                 print("Bot evaluation:", score)
                 move_sound.play()
+                bot.start_pondering(position)
             turn = ChessColor.WHITE
 
         draw_board(win, selected, legal_moves)
@@ -220,6 +225,7 @@ def main():
         draw_coordinates(win, font)
         pygame.display.flip()
 
+    bot.ponder_miss()
     ambient_sound.stop()
     pygame.quit()
 
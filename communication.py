@@ -1,5 +1,285 @@
+from position import Position, START_FEN
+from schemas import ChessColor, SearchInfo
+from bot import ChessBot, MAX_DEPTH, mate_in
+from smp import ParallelChessBot
+from movegen import get_legal_moves
+from moves import move_to_uci
+from book import OpeningBook
+import threading
+import sys
+import os
+
+"""
+UCI (universal chess interface) front end of the engine, so it can be used by chess GUIs
+and tournament managers. Start it with 'python communication.py'.
+https://www.wbec-ridderkerk.nl/html/UCIProtocol.html
+"""
+
+ENGINE_NAME = "ChessBot"
+ENGINE_AUTHOR = "ChessBot developers"
+
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+MAX_THREADS = os.cpu_count() or 1
+
+# time management for 'go wtime ... btime ...': remaining time / moves to go + most of the increment,
+# keeping MOVE_OVERHEAD seconds for the communication with the GUI
+DEFAULT_MOVES_TO_GO = 30
+INCREMENT_RATIO = 0.75
+MOVE_OVERHEAD = 0.05
+MIN_MOVE_TIME = 0.01
+
+
+def time_for_move(remaining: float, increment: float = 0.0, moves_to_go: int | None = None) -> float:
+    """
+    seconds to spend on a move, given the remaining time and increment in seconds
+    """
+    limit = remaining / (moves_to_go or DEFAULT_MOVES_TO_GO) + increment * INCREMENT_RATIO
+    return max(MIN_MOVE_TIME, min(limit, remaining - MOVE_OVERHEAD))
+
+
+def uci_to_move(position: Position, uci: str) -> int:
+    """
+    legal move of the side to move in UCI notation (e.g. 'e2e4', 'e7e8q')
+    """
+    for move in get_legal_moves(position, position.turn):
+        if move_to_uci(move) == uci:
+            return move
+    raise ValueError(f"Illegal move: {uci}")
+
+
+def format_score(score: int) -> str:
+    mate = mate_in(score)
+    return f"mate {mate}" if mate is not None else f"cp {score}"
+
+
+
 class Communicator():
     """
     Class for handling user Input and Response, implementing the uci interface
+
+    Commands are read on the calling thread, the search runs on a worker thread.
+    So 'stop', 'isready' and 'ponderhit' are handled while the engine is thinking.
     """
-    raise NotImplementedError
\ No newline at end of file
+
+    def __init__(self, input=sys.stdin, output=sys.stdout) -> None:
+        self.input = input
+        self.output = output
+        self.output_lock = threading.Lock() # info lines come from the search thread
+
+        self.hash_mb = DEFAULT_HASH_MB
+        self.threads = 1
+        self.book: OpeningBook | None = None
+        self.bot: ChessBot | ParallelChessBot = self.new_bot()
+        self.position = Position(START_FEN)
+
+        self.search_thread: threading.Thread | None = None
+        self.stop_event = threading.Event() # polled by the running search
+        self.release_event = threading.Event() # lets an infinite / ponder search send its bestmove
+        self.ponder_time: float | None = None # time for the move after a ponderhit
+        self.stop_timer: threading.Timer | None = None
+
+
+    def new_bot(self) -> ChessBot | ParallelChessBot:
+        if self.threads > 1:
+            return ParallelChessBot(workers=self.threads, hash_mb=self.hash_mb, book=self.book)
+        return ChessBot(hash_mb=self.hash_mb, book=self.book)
+
+
+    def send(self, line: str) -> None:
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+
+    def send_info(self, info: SearchInfo) -> None:
+        self.send(f"info depth {info.depth} score {format_score(info.score)} nodes {info.nodes} nps {info.nps} "
+                  f"hashfull {info.hashfull} time {int(info.time * 1000)} pv {' '.join(map(move_to_uci, info.pv))}")
+
+
+    def loop(self) -> None:
+        """
+        handles commands until 'quit' or the end of the input
+        """
+        for line in self.input:
+            if not self.handle(line):
+                break
+        self.stop_search()
+        if isinstance(self.bot, ParallelChessBot):
+            self.bot.close()
+        if self.book is not None:
+            self.book.close()
+
+
+    def handle(self, line: str) -> bool:
+        """
+        handles one command, returns False on 'quit'. Unknown commands are ignored, as the protocol asks.
+        A command with invalid arguments (illegal move, value that isn't a number, missing book file)
+        is answered with 'info string <error>' and changes nothing
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        try:
+            return self.run_command(tokens[0], tokens[1:])
+        except (ValueError, OSError) as error:
+            self.send(f"info string {error}")
+            return True
+
+
+    def run_command(self, command: str, args: list[str]) -> bool:
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("option name Ponder type check default false")
+            self.send("option name BookFile type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.stop_search()
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.stop_search()
+            if isinstance(self.bot, ParallelChessBot):
+                self.bot.close()
+            self.bot = self.new_bot()
+        elif command == "position":
+            self.stop_search()
+            self.set_position(args)
+        elif command == "go":
+            self.stop_search()
+            self.go(args)
+        elif command == "stop":
+            self.stop_search()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            return False
+        return True
+
+
+    def set_option(self, args: list[str]) -> None:
+        """
+        setoption name <name> value <value>
+        """
+        if "name" not in args or "value" not in args:
+            return
+        name = " ".join(args[args.index("name") + 1:args.index("value")]).lower()
+        value = " ".join(args[args.index("value") + 1:])
+
+        if name == "hash":
+            self.hash_mb = max(1, min(int(value), MAX_HASH_MB))
+        elif name == "threads":
+            self.threads = max(1, min(int(value), MAX_THREADS))
+        elif name == "bookfile":
+            book = OpeningBook(value) if value and value != "<empty>" else None
+            if self.book is not None:
+                self.book.close()
+            self.book = book
+        else:
+            return # Ponder only tells us that the GUI may send 'go ponder'
+        if isinstance(self.bot, ParallelChessBot):
+            self.bot.close()
+        self.bot = self.new_bot()
+
+
+    def set_position(self, args: list[str]) -> None:
+        """
+        position [fen <fen> | startpos] moves <move1> ... <movei>
+        """
+        moves = args.index("moves") if "moves" in args else len(args)
+        if args and args[0] == "fen":
+            position = Position(" ".join(args[1:moves]))
+        else:
+            position = Position(START_FEN)
+
+        for uci in args[moves + 1:]:
+            position.move(uci_to_move(position, uci))
+        self.position = position
+
+
+    def go(self, args: list[str]) -> None:
+        """
+        go [wtime, btime, winc, binc, movestogo, movetime <x>] [depth <x>] [nodes <x>] [infinite] [ponder]
+        """
+        values = {}
+        for name, value in zip(args, args[1:]):
+            if name in ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth", "nodes"):
+                values[name] = int(value)
+        infinite, ponder = "infinite" in args, "ponder" in args
+
+        # times are given in milliseconds
+        time_limit = None
+        if "movetime" in values:
+            time_limit = max(MIN_MOVE_TIME, values["movetime"] / 1000 - MOVE_OVERHEAD)
+        else:
+            own = "wtime" if self.position.turn == ChessColor.WHITE else "btime"
+            if own in values:
+                increment = values.get("winc" if own == "wtime" else "binc", 0)
+                time_limit = time_for_move(values[own] / 1000, increment / 1000, values.get("movestogo"))
+
+        depth = min(values.get("depth", MAX_DEPTH), MAX_DEPTH)
+        node_limit = values.get("nodes")
+
+        # a ponder search runs without limit until 'ponderhit' (then the time starts) or 'stop'
+        self.ponder_time = time_limit if ponder else None
+        if infinite or ponder:
+            time_limit = None
+            self.release_event.clear()
+        else:
+            self.release_event.set()
+
+        self.stop_event.clear()
+        self.bot.stop_event = self.stop_event
+        self.search_thread = threading.Thread(target=self.search, args=(self.position, depth, time_limit, node_limit), daemon=True)
+        self.search_thread.start()
+
+
+    def search(self, position: Position, depth: int, time_limit: float | None, node_limit: int | None) -> None:
+        move = self.bot.find_best_move(position, depth, position.turn, time_limit, node_limit, callback=self.send_info)
+        # in infinite and ponder mode the best move may only be sent after 'stop' / 'ponderhit'
+        self.release_event.wait()
+
+        if move is None:
+            self.send("bestmove 0000")
+        elif len(self.bot.pv) > 1 and self.bot.pv[0] == move:
+            self.send(f"bestmove {move_to_uci(move)} ponder {move_to_uci(self.bot.pv[1])}")
+        else:
+            self.send(f"bestmove {move_to_uci(move)}")
+
+
+    def ponderhit(self) -> None:
+        """
+        the expected move was played: the ponder search becomes the normal search, with the time of the go command
+        """
+        if self.search_thread is None or not self.search_thread.is_alive():
+            return
+        if self.ponder_time is not None:
+            if isinstance(self.bot, ChessBot):
+                self.bot.set_time_limit(self.ponder_time) # so no new iteration is started after the soft deadline
+            # the timer makes sure the search ends, also for the parallel search, which can't be reached here
+            self.stop_timer = threading.Timer(self.ponder_time, self.stop_event.set)
+            self.stop_timer.start()
+        self.release_event.set()
+
+
+    def stop_search(self) -> None:
+        """
+        stops a running search and waits until its bestmove is sent
+        """
+        if self.search_thread is not None:
+            self.stop_event.set()
+            self.release_event.set()
+            self.search_thread.join()
+            self.search_thread = None
+        if self.stop_timer is not None:
+            self.stop_timer.cancel()
+            self.stop_timer = None
+
+
+
+if __name__ == '__main__':
+    Communicator().loop()
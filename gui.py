@@ -1,8 +1,9 @@
 import pygame
 import os
 from position import Position
-from movegen import get_pseudo_legal_moves, filter_legal_moves
+from movegen import get_legal_moves
 from schemas import ChessColor
+from moves import to_chess_move, from_chess_move, move_origin
 from evaluation import evaluate_position
 
 # Constants
@@ -186,7 +187,7 @@ def main():
                             if move.target.x == bx and move.target.y == by:
                                 # Animate move
                                 animate_move(win, images, position, move, piece_map, font)
-                                position.move(move)
+                                position.move(from_chess_move(move, position))
                                 score = evaluate_position(position)
                                 print(score)
                                 move_sound.play()
@@ -198,18 +199,14 @@ def main():
                             # Select new piece if it's your color
                             if piece and piece.color == turn:
                                 selected = (bx, by)
-                                pseudo_moves = get_pseudo_legal_moves(position, turn)
-                                filtered_moves = [m for m in pseudo_moves if m.origin.x == bx and m.origin.y == by]
-                                legal_moves = filter_legal_moves(position, turn, filtered_moves) # new change here: only allow truly legal moves
+                                legal_moves = [to_chess_move(m, turn) for m in get_legal_moves(position, turn) if move_origin(m) == by * 8 + bx]
                             else:
                                 selected = None
                                 legal_moves = []
                     else:
                         if piece and piece.color == turn:
                             selected = (bx, by)
-                            pseudo_moves = get_pseudo_legal_moves(position, turn)
-                            filtered_moves = [m for m in pseudo_moves if m.origin.x == bx and m.origin.y == by]
-                            legal_moves = filter_legal_moves(position, turn, filtered_moves) # new change here: only allow truly legal moves
+                            legal_moves = [to_chess_move(m, turn) for m in get_legal_moves(position, turn) if move_origin(m) == by * 8 + bx]
                         else:
                             selected = None
                             legal_moves = []
@@ -2,19 +2,26 @@ from position import Position
 from bot import ChessBot
 from schemas import ChessColor
 from utils import move_to_long_algebraic
+from moves import to_chess_move
+from book import OpeningBook
+import os
 
 """
 simulating a game between 2 of our bots
 """
 
 pos = Position("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR") # init position via fen for standard chess starting-position
-engine_white = ChessBot()
-engine_black = ChessBot()
+
+# both bots play from the opening book, if there is one (any Polyglot .bin file)
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+book = OpeningBook(BOOK_FILE) if os.path.exists(BOOK_FILE) else None
+engine_white = ChessBot(book=book)
+engine_black = ChessBot(book=book)
 
 while True:
     white_move = engine_white.find_best_move(pos, 3, ChessColor.WHITE)
     pos.move(white_move)
-    print(f"white engine plays: {move_to_long_algebraic(white_move)}")
+    print(f"white engine plays: {move_to_long_algebraic(to_chess_move(white_move, ChessColor.WHITE))}")
     black_move = engine_black.find_best_move(pos, 3, ChessColor.BLACK)
     pos.move(black_move)
-    print(f"black engine responds: {move_to_long_algebraic(black_move)}")
\ No newline at end of file
+    print(f"black engine responds: {move_to_long_algebraic(to_chess_move(black_move, ChessColor.BLACK))}")
\ No newline at end of file
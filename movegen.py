@@ -1,85 +1,127 @@
-from schemas import Pawn, Bishop, Knight, Rook, Queen, King
-from schemas import ChessMove, ChessColor, ChessCastling, Coordinate, PromotionPiece
-from utils import check_bounds
+from schemas import ChessColor, Coordinate
+from bitboards import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, PIECE_CHARS
+from bitboards import WHITE, make_piece, piece_kind, piece_color, lsb_index, square_to_coordinate
+from bitboards import knight_attacks, king_attacks, pawn_attacks, rook_attacks, bishop_attacks, between
+from bitboards import FULL_BOARD, FILE_A, FILE_H, RANK_1, RANK_3, RANK_6, RANK_8
+from moves import CAPTURE, DOUBLE_PAWN_MOVE, EN_PASSANT, CASTLING, PROMOTION_SHIFT
 from position import Position
+from position import WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE
+from psqt import kind_values
 from typing import List
 
 """
-This File implements functions related to chess-move generation. 
-"""
-
+This File implements functions related to chess-move generation.
+Moves are generated in the compact int format described in moves.py
 
-piece_values = {
-    "p" : 100.0,
-    'n' : 300.0,
-    'b' : 300.0,
-    'r' : 500.0,
-    'q' : 900.0
-}
+Legal moves are generated directly: checkers and pinned pieces are computed once per
+position, so no move has to be played to find out whether it leaves the king in check.
+https://www.chessprogramming.org/Move_Generation#Legal
+"""
 
 
 # finds the coordinates of a king (util function)
 def find_king(position: Position, color: ChessColor) -> Coordinate:
-    for y, row in enumerate(position.board):
-        for x, col in enumerate(row):
-            piece = position.board[y][x]
-            if isinstance(piece, King) and piece.color == color:
-                return Coordinate(x=x, y=y)
-    raise ValueError("King not found on board!")
-
-
-
-# set the instance-variable 'in_check' True for a King, if he is indeed in check
-def set_check(position: Position, color: ChessColor) -> None:
-    king_pos = find_king(position, color)
-    attacked_fields = position.attacked_fields_white if color == ChessColor.BLACK else position.attacked_fields_black # attacked fields
-
-    # check if king is attacked
-    check = any(coor == king_pos for coor in attacked_fields)
-
-    position.board[king_pos.y][king_pos.x].in_check = check # set instance variable in_check accordingly
+    king_bb = position.bitboards[make_piece(KING, color.value)]
+    if not king_bb:
+        raise ValueError("King not found on board!")
+    return square_to_coordinate(lsb_index(king_bb))
 
 
 
-def score_move(position: Position, move: ChessMove, turn: ChessColor) -> int:
+def see(position: Position, move: int) -> int:
+    """
+    static exchange evaluation: material the side to move wins (negative: loses) on the target
+    square of 'move' if both sides keep recapturing with their least valuable attacker and may
+    stop whenever continuing would lose. Sliders behind other attackers (x-rays) join the exchange
+    once the piece in front of them has captured. Pins are ignored.
+    https://www.chessprogramming.org/SEE_-_The_Swap_Algorithm
+    """
+    origin, target = move & 63, (move >> 6) & 63
+    bitboards, occupancy = position.bitboards, position.occupancy
+    occupied = position.occupied ^ (1 << origin)
+
+    if move & EN_PASSANT:
+        occupied ^= 1 << ((origin & 56) | (target & 7))
+        victim_value = kind_values[PAWN]
+    else:
+        victim = position.squares[target]
+        victim_value = 0 if victim is None else kind_values[victim % 6]
+
+    mover = position.squares[origin]
+    on_square = kind_values[mover % 6] # value of the piece that stands on target after the capture
+    promotion = move >> PROMOTION_SHIFT
+    if promotion:
+        victim_value += kind_values[promotion] - kind_values[PAWN]
+        on_square = kind_values[promotion]
+
+    queens = bitboards[QUEEN] | bitboards[6 + QUEEN]
+    bishops = bitboards[BISHOP] | bitboards[6 + BISHOP] | queens
+    rooks = bitboards[ROOK] | bitboards[6 + ROOK] | queens
+    attackers = position.attackers_to(target, occupied) & occupied
+
+    gain = [victim_value]
+    side = mover // 6 ^ 1
+    while True:
+        side_attackers = attackers & occupancy[side]
+        if not side_attackers:
+            break
+
+        # least valuable attacker
+        for kind in range(6):
+            bb = side_attackers & bitboards[side * 6 + kind]
+            if bb:
+                break
+
+        # value if 'side' recaptures (and the other side stops after that)
+        gain.append(on_square - gain[-1])
+        on_square = kind_values[kind]
+
+        occupied ^= bb & -bb
+        if kind in (PAWN, BISHOP, QUEEN):
+            attackers |= bishop_attacks(target, occupied) & bishops
+        if kind in (ROOK, QUEEN):
+            attackers |= rook_attacks(target, occupied) & rooks
+        attackers &= occupied
+        side ^= 1
+
+    # every side may stand pat instead of recapturing
+    for i in range(len(gain) - 1, 0, -1):
+        gain[i - 1] = -max(-gain[i - 1], gain[i])
+    return gain[0]
+
+
+
+def score_move(position: Position, move: int, turn: ChessColor) -> int:
+    """
+    static ordering score of a move, only reads the position (no move is played)
+    """
     score = 0
+    origin, target = move & 63, (move >> 6) & 63
+    attacker_type = PIECE_CHARS[piece_kind(position.squares[origin])]
 
-    # captures
-    if move.captured_piece:
-        victim_value = piece_values[move.captured_piece.fen_char]
-        attacker_value = piece_values[position.get_piece(move.origin).fen_char]
-        score += 10_000 + victim_value - attacker_value
+    # captures, losing ones after the quiet moves
+    if move & CAPTURE:
+        exchange = see(position, move)
+        score += 10_000 + exchange if exchange >= 0 else exchange
 
     # promotions
-    if move.promotion:
+    if move >> PROMOTION_SHIFT:
         score += 8_000
 
-    # checks
-    captured_piece = position.move(move)
-    position.update_attacked_fields()
-    king_color = ChessColor.WHITE if turn == ChessColor.BLACK else ChessColor.BLACK
-    attack_list = position.attacked_fields_black if turn == ChessColor.BLACK else position.attacked_fields_white
-    king_pos = find_king(position, king_color)
-
-    if king_pos in attack_list:
-        score += 5_000
-    position.undo_move(move, captured_piece)
-
-
     # castling
-    if move.castling:
+    if move & CASTLING:
         score += 2000
 
     # central pawn pushes
-    if position.get_piece(move.origin).fen_char == 'p':
-        if move.target.x in (3, 4) and move.target.y in (3, 4):  
+    if attacker_type == 'p':
+        if target & 7 in (3, 4) and target >> 3 in (3, 4):
             score += 500
 
     return score
 
 
 
-def order_moves(position: Position, moves: List[ChessMove], turn: ChessColor) -> List[ChessMove]:
+def order_moves(position: Position, moves: List[int], turn: ChessColor) -> List[int]:
     """
     Orders List of moves by putting important moves (captures, checks...) at the start of the List.
     Ordering makes alpha beta pruning much faster since weaker moves at the end of the List can be
@@ -89,265 +131,334 @@ def order_moves(position: Position, moves: List[ChessMove], turn: ChessColor) ->
 
 
 
-def generate_moves(position: Position, turn: ChessColor) -> List[ChessMove]:
+def generate_moves(position: Position, turn: ChessColor) -> List[int]:
+    """
+    returns the legal moves of 'turn', ordered by order_moves()
+    """
+    return order_moves(position, get_legal_moves(position, turn), turn)
+
+
+
+def get_legal_moves(position: Position, turn: ChessColor) -> List[int]:
     """
-    first calculates pseudo legal moves, then extract true legal moves and return them
+    Return all legal moves in the current position (unordered)
     """
-    pseudo_legal_moves = get_pseudo_legal_moves(position, turn) # pseudo legal moves
-    true_legal_moves = filter_legal_moves(position, turn, pseudo_legal_moves) # true legal moves
-    ordered_moves = order_moves(position, true_legal_moves, turn)
-    return ordered_moves
+    return _generate(position, turn.value, True)
 
 
-def filter_legal_moves(position: Position, turn: ChessColor, pseudo_legal_moves: List[ChessMove]) -> List[ChessMove]:
+
+def get_check_info(position: Position, turn: ChessColor) -> tuple:
     """
-    Filter the true legal moves out of our pseudo-legal-ones and return them
+    checkers, check mask, pinned pieces and pin rays of 'turn' (see _check_info). Callers that generate the
+    legal moves of one position in several parts compute them once and pass them to every part, which also
+    shares the slider attacks between the parts. Only valid as long as the position doesn't change
     """
-    legal_moves = []
+    return _check_info(position, turn.value)
 
-    # validate every pseudo_move and only store true legal moves
-    for move in pseudo_legal_moves:
-        captured_piece = position.move(move) # 1. play pseudo_legal_move
-        position.update_attacked_fields()
 
-        attacked_fields = position.attacked_fields_white if turn == ChessColor.BLACK else position.attacked_fields_black # new attacked fields
-        move_valid: bool = False
 
-        # 2. now check if king is under attack
-        king_pos = find_king(position, turn)
+def get_legal_captures(position: Position, turn: ChessColor, check_info: tuple | None = None) -> List[int]:
+    """
+    Return the legal captures and promotions in the current position (unordered), e.g. for quiescence search
+    """
+    return _generate(position, turn.value, True, True, False, check_info=check_info)
 
-        attacked_fields = (
-            position.attacked_fields_white if turn == ChessColor.BLACK
-            else position.attacked_fields_black
-        )
-        move_valid = king_pos not in attacked_fields
 
 
-        # extra check for castling
-        if move.castling is not None:
-            if move.castling == ChessCastling.KINGSIDE:
-                squares_to_check = [0, 1, 2]  # start, f1/f8, g1/g8
-            else:  # QUEENSIDE
-                squares_to_check = [0, -1, -2]  # start, d1/d8, c1/c8
+def get_legal_quiets(position: Position, turn: ChessColor, check_info: tuple | None = None) -> List[int]:
+    """
+    Return the legal moves that are neither captures nor promotions (unordered)
+    """
+    return _generate(position, turn.value, True, False, True, check_info=check_info)
 
-            move_valid = all(
-                Coordinate(x=king_pos.x + dx, y=king_pos.y) not in attacked_fields
-                for dx in squares_to_check
-            )
 
-        # 3. move is valid if king is not under attack
-        if move_valid:
-            legal_moves.append(move)
-        position.undo_move(move, captured_piece) # 3. reset the played pseudo_legal_move
-        #set_check(position, turn) # try to set king back
-    return legal_moves
-        
+
+def get_legal_moves_from(position: Position, turn: ChessColor, square: int, check_info: tuple | None = None) -> List[int]:
+    """
+    Return the legal moves of the piece on 'square' (empty if it isn't a piece of 'turn')
+    """
+    return _generate(position, turn.value, True, True, True, 1 << square, check_info)
+
+
+
+def is_legal_move(position: Position, turn: ChessColor, move: int, check_info: tuple | None = None) -> bool:
+    """
+    True if 'move' (e.g. a hash move, which may come from another position) is legal for 'turn'.
+    Moves that don't fit the board are rejected without generating anything
+    """
+    origin, target = move & 63, (move >> 6) & 63
+    piece, victim = position.squares[origin], position.squares[target]
+    if piece is None or piece_color(piece) != turn.value:
+        return False
+    if move & EN_PASSANT:
+        if target != position.en_passant_square:
+            return False
+    elif bool(move & CAPTURE) != (victim is not None) or (victim is not None and piece_color(victim) == turn.value):
+        return False
+    return move in _generate(position, turn.value, True, True, True, 1 << origin, check_info)
 
 
-def get_pseudo_legal_moves(position: Position, turn: ChessColor) -> List[ChessMove]:
+
+def get_pseudo_legal_moves(position: Position, turn: ChessColor) -> List[int]:
     """
-    Return all pseudo_legal moves in current position
+    Return all pseudo_legal moves in current position, these may leave the own king in check.
     https://www.chessprogramming.org/Pseudo-Legal_Move
+    """
+    return _generate(position, turn.value, False)
+
+
 
-    TODO God method, needs to be refactored eventually
+def filter_legal_moves(position: Position, turn: ChessColor, pseudo_legal_moves: List[int]) -> List[int]:
     """
+    Filter the true legal moves out of our pseudo-legal-ones and return them
+    """
+    legal_moves = []
+    own, enemy = turn.value, turn.value ^ 1
+    king_bb = position.bitboards[make_piece(KING, own)]
+    if not king_bb:
+        raise ValueError("King not found on board!")
+    king_square = king_bb.bit_length() - 1
+
+    # validate every pseudo_move and only store true legal moves
+    for move in pseudo_legal_moves:
+        origin = move & 63
+
+        # castling: the king may not be in check, pass through or land on an attacked square
+        if move & CASTLING:
+            step = 1 if (move >> 6) & 63 > origin else -1
+            if not any(position.is_square_attacked(origin + i * step, enemy) for i in range(3)):
+                legal_moves.append(move)
+            continue
+
+        position.move(move) # 1. play pseudo_legal_move
+
+        # 2. now check if king is under attack (it might have been the piece that moved)
+        square = (move >> 6) & 63 if origin == king_square else king_square
+        if not position.is_square_attacked(square, enemy):
+            legal_moves.append(move)
+
+        position.undo_move(move) # 3. reset the played pseudo_legal_move
+    return legal_moves
 
-    board = position.board
-    moves = [] # our List to return
-
-    # get all pieces that match color
-    pieces = [piece for row in board for piece in row if piece is not None and piece.color == turn]
-
-    # Mainloop where moves should be extracted, checked and appended to List
-    for y, row in enumerate(board):
-        for x, col in enumerate(row):
-            piece = board[y][x]
-            if piece in pieces:
-                piece_type = piece.fen_char
-                piece_color = piece.color
-                offsets = position.move_directions[piece_type]
-
-                # PAWNS TODO Needs extra logic for double move, en passant, promotion and color difference (black vs white pawns)
-                if piece_type == 'p':
-                    for i, (dx, dy) in enumerate(offsets):
-                        # flip direction if color is black (pawns are the only pieces that move differently based on their color)
-                        if turn == ChessColor.WHITE:
-                            nx = x + dx
-                            ny = y + dy
-                        else:
-                            nx = x - dx
-                            ny = y - dy
-
-                        if check_bounds(nx, ny):
-                            # Straight moves (No capture)
-                            if i == 0: # single move
-                                # Square needs to be empty
-                                if board[ny][nx] is None:
-                                    # Promotion
-                                    if piece_color == ChessColor.WHITE and ny == 0 or piece_color == ChessColor.BLACK and ny == 7:
-                                        for prom in PromotionPiece:
-                                            moves.append(ChessMove(
-                                                origin=Coordinate(x=x, y=y),
-                                                target=Coordinate(x=nx, y=ny),
-                                                color=turn,
-                                                promotion=prom
-                                                )
-                                            )
-                                    # Regular single move
-                                    else:
-                                        moves.append(ChessMove(
-                                                origin=Coordinate(x=x, y=y),
-                                                target=Coordinate(x=nx, y=ny),
-                                                color=turn,
-                                                promotion=None
-                                                )
-                                            )
-
-                            if i == 1: # double move
-                                # Square needs to be empty
-                                if board[ny][nx] is None and ((piece_color == ChessColor.WHITE and y == 6) or (piece_color == ChessColor.BLACK and y == 1)):
-                                    mid_y = y - 1 if piece_color == ChessColor.WHITE else y + 1
-                                    if board[mid_y][nx] is None:
-                                        moves.append(ChessMove(
-                                                    origin=Coordinate(x=x, y=y),
-                                                    target=Coordinate(x=nx, y=ny),
-                                                    color=turn,
-                                                    promotion=None,
-                                                    double_move=True
-                                                    )
-                                                )
-
-                            # Diagonal moves (capture) # TODO need to handle en passant her
-                            elif i in (2, 3):
-                                # Square needs to be taken
-                                if board[ny][nx] is not None and board[ny][nx].color != turn:
-                                    moves.append(ChessMove(
-                                                origin=Coordinate(x=x, y=y),
-                                                target=Coordinate(x=nx, y=ny),
-                                                color=turn,
-                                                promotion=None
-                                                )
-                                            )
-
-                                # en passant
-                                if position.en_passant_square is not None and (nx, ny) == (position.en_passant_square.x, position.en_passant_square.y):
-                                    allowed_y = 3 if turn == ChessColor.WHITE else 4
-                                    if y == allowed_y:
-                                        moves.append(ChessMove(
-                                                    origin=Coordinate(x=x, y=y),
-                                                    target=Coordinate(x=nx, y=ny),
-                                                    color=turn,
-                                                    promotion=None,
-                                                    en_passant=True
-                                                    )
-                                                )
-
-
-                            
-                # KINGS TODO Needs extra logic for castling (but no check and checkmate validation here yet)
-                elif piece_type == 'k':
-                    for dx, dy in offsets:
-                        # calculate new square
-                        nx = x + dx
-                        ny = y + dy
-
-                        if check_bounds(nx, ny):
-                            target_piece = board[ny][nx]
-
-                            if target_piece is None or target_piece.color != turn:
-                                moves.append(ChessMove(
-                                                origin=Coordinate(x=x, y=y),
-                                                target=Coordinate(x=nx, y=ny),
-                                                color=turn,
-                                                promotion=None
-                                                )
-                                            )
-
-                    # CASTLING
-                    if position.castling_rights[turn]["queenside"]:
-                    # QUEENSIDE
-                        if check_bounds(x - 4, y):
-                            q_target = board[y][x - 4]
-                            
-                            if isinstance(q_target, Rook) and q_target.color == turn:
-                                if all(board[y][x - i] is None for i in range(1, 3)): #TODO bug here maybe?
-                                    moves.append(ChessMove(
-                                        origin=Coordinate(x=x, y=y),
-                                        target=Coordinate(x=x-2, y=y),
-                                        color=turn,
-                                        promotion=None,
-                                        castling=ChessCastling.QUEENSIDE
-                                        )
-                                    )
-
-                    if position.castling_rights[turn]["kingside"]:
-                    # KINGSIDE
-                        if check_bounds(x + 3, y):
-                            k_target = board[y][x + 3]
-                            if isinstance(k_target, Rook) and k_target.color == turn:
-                                if all(board[y][x + i] is None for i in range(1, 3)):
-                                    moves.append(ChessMove(
-                                        origin=Coordinate(x=x, y=y),
-                                        target=Coordinate(x=x+2, y=y),
-                                        color=turn,
-                                        promotion=None,
-                                        castling=ChessCastling.KINGSIDE
-                                        )
-                                    )
-                            
-
-
-                # KNIGHTS
-                elif piece_type == 'n':
-                    for dx, dy in offsets:
-                        # calculate new square
-                        nx = x + dx
-                        ny = y + dy
-
-                        if check_bounds(nx, ny):
-                            target_piece = board[ny][nx]
-
-                            if target_piece is None or target_piece.color != turn:
-                                moves.append(ChessMove(
-                                    origin=Coordinate(x=x, y=y),
-                                    target=Coordinate(x=nx, y=ny),
-                                    color=turn,
-                                    promotion=None
-                                    )
-                                )
-
-
-
-                # BISHOPS, ROOKS, QUEENS
-                elif piece_type in ('b', 'r', 'q'):
-                    for dx, dy in offsets:
-                        # calculate new square
-                        nx = x + dx
-                        ny = y + dy
-
-                        while check_bounds(nx, ny): # check if square in board
-                            target_piece = board[ny][nx]
-                            if target_piece is None: # square empty
-                                moves.append(ChessMove(
-                                    origin=Coordinate(x=x, y=y),
-                                    target=Coordinate(x=nx, y=ny),
-                                    color=turn,
-                                    promotion=None
-                                    )
-                                )
-                                # new square:
-                                nx += dx
-                                ny += dy
-
-                            else: # square taken
-                                if target_piece.color != turn:
-                                    moves.append(ChessMove(
-                                        origin=Coordinate(x=x, y=y),
-                                        target=Coordinate(x=nx, y=ny),
-                                        color=turn,
-                                        promotion=None
-                                        )
-                                    )
-                                break # end loop because of block
-
-    return moves
\ No newline at end of file
+
+
+def _check_info(position: Position, own: int, cache: bool = True) -> tuple[int, int, int, dict[int, int], dict[int, int] | None]:
+    """
+    what limits the legal moves of color 'own', plus a cache for the generation in several parts:
+        checkers       - enemy pieces giving check
+        check mask     - squares every non king move has to end on (all squares if not in check, none in double check)
+        pinned         - own pieces that are pinned to the king
+        pin rays       - pinned square -> squares it may still move to
+        slider attacks - origin (+ 64 for rook moves) -> attacked squares of the own sliders, filled by _generate.
+                         None if cache is off
+    """
+    bitboards = position.bitboards
+    enemy_base = (own ^ 1) * 6
+    occupied = position.occupied
+    own_occ, enemy_occ = position.occupancy[own], position.occupancy[own ^ 1]
+
+    king_bb = bitboards[own * 6 + KING]
+    if not king_bb:
+        raise ValueError("King not found on board!")
+    king_square = king_bb.bit_length() - 1
+    enemy_queens = bitboards[enemy_base + QUEEN]
+    enemy_rooks = bitboards[enemy_base + ROOK] | enemy_queens
+    enemy_bishops = bitboards[enemy_base + BISHOP] | enemy_queens
+
+    target_mask = FULL_BOARD
+    checkers = position.attackers_to(king_square, occupied) & enemy_occ
+    if checkers & (checkers - 1):
+        target_mask = 0 # double check
+    elif checkers:
+        target_mask = checkers | between[king_square][checkers.bit_length() - 1]
+
+    # a piece is pinned if it is the only piece between our king and an enemy slider looking at it
+    pinned = 0
+    pin_rays = {}
+    snipers = (rook_attacks(king_square, enemy_occ) & enemy_rooks) | (bishop_attacks(king_square, enemy_occ) & enemy_bishops)
+    while snipers:
+        sniper = snipers & -snipers
+        snipers ^= sniper
+        ray = between[king_square][sniper.bit_length() - 1]
+        blockers = ray & occupied
+        if blockers & own_occ and not blockers & (blockers - 1):
+            pinned |= blockers
+            pin_rays[blockers.bit_length() - 1] = ray | sniper
+    return checkers, target_mask, pinned, pin_rays, {} if cache else None
+
+
+
+def _generate(position: Position, own: int, legal: bool, noisy: bool = True, quiets: bool = True, origins: int = FULL_BOARD,
+              check_info: tuple | None = None) -> List[int]:
+    """
+    Generates the moves of color 'own' from the bitboards of the position.
+
+    If legal is set, only legal moves are returned:
+        - in double check only the king moves
+        - in single check all other pieces have to capture the checker or block the check
+        - pinned pieces only move along the ray between king and pinning piece
+        - king moves and en passant are checked with the occupancy they leave behind
+    otherwise all of these checks are skipped (pseudo legal moves)
+
+    noisy moves are captures and promotions, quiets all other moves. Either group can be switched off.
+    Only pieces on the squares in the bitboard 'origins' are moved.
+    check_info: the result of _check_info for 'own' in this position, computed here if not given.
+    """
+    bitboards = position.bitboards
+    enemy = own ^ 1
+    base, enemy_base = own * 6, enemy * 6
+    occupied = position.occupied
+    own_occ, enemy_occ = position.occupancy[own], position.occupancy[enemy]
+    moves = []
+    append = moves.append
+
+    king_bb = bitboards[base + KING]
+    if not king_bb:
+        raise ValueError("King not found on board!")
+    king_square = king_bb.bit_length() - 1
+
+    enemy_queens = bitboards[enemy_base + QUEEN]
+    enemy_rooks = bitboards[enemy_base + ROOK] | enemy_queens
+    enemy_bishops = bitboards[enemy_base + BISHOP] | enemy_queens
+
+    if legal:
+        checkers, target_mask, pinned, pin_rays, slider_attacks = check_info if check_info is not None else _check_info(position, own, False)
+    else:
+        checkers, target_mask, pinned, pin_rays, slider_attacks = 0, FULL_BOARD, 0, {}, None
+
+    if target_mask:
+        not_own = ~own_occ & target_mask
+        if not quiets:
+            not_own &= enemy_occ
+        if not noisy:
+            not_own &= ~occupied
+
+        # PAWNS
+        pawns = bitboards[base + PAWN] & origins
+        empty = ~occupied & FULL_BOARD
+        if own == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & RANK_3) >> 8) & empty
+            pawn_targets = (
+                (single, 8, 0),
+                (double, 16, DOUBLE_PAWN_MOVE),
+                (((pawns & ~FILE_A) >> 9) & enemy_occ, 9, CAPTURE),
+                (((pawns & ~FILE_H) >> 7) & enemy_occ, 7, CAPTURE)
+            )
+            promotion_rank = RANK_8
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & RANK_6) << 8) & empty
+            pawn_targets = (
+                (single, -8, 0),
+                (double, -16, DOUBLE_PAWN_MOVE),
+                (((pawns & ~FILE_A) << 7) & enemy_occ, -7, CAPTURE),
+                (((pawns & ~FILE_H) << 9) & enemy_occ, -9, CAPTURE)
+            )
+            promotion_rank = RANK_1
+
+        if not quiets:
+            pawn_targets = ((pawn_targets[0][0] & promotion_rank, pawn_targets[0][1], 0),) + pawn_targets[2:]
+        if not noisy:
+            pawn_targets = ((pawn_targets[0][0] & ~promotion_rank, pawn_targets[0][1], 0), pawn_targets[1])
+
+        # offset is origin - target
+        for targets, offset, flags in pawn_targets:
+            targets &= target_mask
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                target = low.bit_length() - 1
+                origin = target + offset
+                if pinned >> origin & 1 and not pin_rays[origin] & low:
+                    continue
+                if low & promotion_rank:
+                    for prom in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        append(origin | (target << 6) | flags | (prom << PROMOTION_SHIFT))
+                else:
+                    append(origin | (target << 6) | flags)
+
+        # KNIGHTS (a pinned knight can never move)
+        bb = bitboards[base + KNIGHT] & ~pinned & origins
+        while bb:
+            low = bb & -bb
+            bb ^= low
+            origin = low.bit_length() - 1
+            targets = knight_attacks[origin] & not_own
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                append(origin | ((low.bit_length() - 1) << 6) | (CAPTURE if low & enemy_occ else 0))
+
+        # BISHOPS, ROOKS, QUEENS (queens are part of both groups)
+        queens = bitboards[base + QUEEN]
+        for bb, attacks, key in ((bitboards[base + BISHOP] | queens, bishop_attacks, 0), (bitboards[base + ROOK] | queens, rook_attacks, 64)):
+            bb &= origins
+            while bb:
+                low = bb & -bb
+                bb ^= low
+                origin = low.bit_length() - 1
+                if slider_attacks is None:
+                    targets = attacks(origin, occupied) & not_own
+                else:
+                    # the next stage of the same position gets them from the cache
+                    targets = slider_attacks.get(origin + key)
+                    if targets is None:
+                        targets = slider_attacks[origin + key] = attacks(origin, occupied)
+                    targets &= not_own
+                if low & pinned:
+                    targets &= pin_rays[origin]
+                while targets:
+                    low = targets & -targets
+                    targets ^= low
+                    append(origin | ((low.bit_length() - 1) << 6) | (CAPTURE if low & enemy_occ else 0))
+
+    # EN PASSANT
+    ep = position.en_passant_square
+    if ep is not None and noisy:
+        captured = ep + 8 if own == WHITE else ep - 8
+        bb = pawn_attacks[enemy][ep] & bitboards[base + PAWN] & origins
+        while bb:
+            low = bb & -bb
+            bb ^= low
+            if legal:
+                # two pawns leave the board at once (and one lands on ep), this can discover a check
+                # along the rank that no pin detection sees, so look at the resulting occupancy directly
+                occ = (occupied ^ low ^ (1 << captured)) | (1 << ep)
+                if rook_attacks(king_square, occ) & enemy_rooks or bishop_attacks(king_square, occ) & enemy_bishops:
+                    continue
+                # knights and pawns giving check have to be the captured pawn
+                if checkers & ~(enemy_rooks | enemy_bishops) & ~(1 << captured):
+                    continue
+            append((low.bit_length() - 1) | (ep << 6) | CAPTURE | EN_PASSANT)
+
+    # KING
+    if king_bb & origins:
+        targets = king_attacks[king_square] & ~own_occ
+        if not quiets:
+            targets &= enemy_occ
+        if not noisy:
+            targets &= ~occupied
+        occ = occupied ^ king_bb # the king must not hide behind itself from a slider
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            target = low.bit_length() - 1
+            if legal and position.attackers_to(target, occ) & enemy_occ:
+                continue
+            append(king_square | (target << 6) | (CAPTURE if low & enemy_occ else 0))
+
+        # CASTLING (the rights guarantee king and rook are on their start squares)
+        rights = position.castling_rights & ((WHITE_KINGSIDE | WHITE_QUEENSIDE) if own == WHITE else (BLACK_KINGSIDE | BLACK_QUEENSIDE))
+        if rights and quiets and not checkers:
+            rooks = bitboards[base + ROOK]
+            if rights & (WHITE_KINGSIDE | BLACK_KINGSIDE) and rooks >> (king_square + 3) & 1 \
+                    and not occupied & between[king_square][king_square + 3]:
+                if not legal or not (position.is_square_attacked(king_square + 1, enemy) or position.is_square_attacked(king_square + 2, enemy)):
+                    append(king_square | ((king_square + 2) << 6) | CASTLING)
+            if rights & (WHITE_QUEENSIDE | BLACK_QUEENSIDE) and rooks >> (king_square - 4) & 1 \
+                    and not occupied & between[king_square][king_square - 4]:
+                if not legal or not (position.is_square_attacked(king_square - 1, enemy) or position.is_square_attacked(king_square - 2, enemy)):
+                    append(king_square | ((king_square - 2) << 6) | CASTLING)
+
+    return moves
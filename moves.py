@@ -0,0 +1,112 @@
+from schemas import ChessMove, ChessColor, ChessCastling, Coordinate, PromotionPiece
+from bitboards import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, piece_kind
+
+"""
+This File implements the compact move format used inside the engine.
+
+A move is a plain int:
+    bits  0 - 5   origin square
+    bits  6 - 11  target square
+    bits 12 - 15  flags (capture, double pawn move, en passant, castling)
+    bits 16 - 18  piece kind the pawn promotes to (0 = no promotion)
+
+0 is never a valid move and is used as 'no move'.
+ChessMove objects are only used at the boundary (GUI, notation), see to_chess_move / from_chess_move.
+"""
+
+
+# flags, already shifted into place
+CAPTURE = 1 << 12
+DOUBLE_PAWN_MOVE = 1 << 13
+EN_PASSANT = 1 << 14
+CASTLING = 1 << 15
+
+PROMOTION_SHIFT = 16
+
+NO_MOVE = 0
+
+# maps the promotion piece kind of a move to the PromotionPiece enum and back
+promotion_pieces = {
+    KNIGHT: PromotionPiece.KNIGHT,
+    BISHOP: PromotionPiece.BISHOP,
+    ROOK: PromotionPiece.ROOK,
+    QUEEN: PromotionPiece.QUEEN
+}
+promotion_kinds = {piece: kind for kind, piece in promotion_pieces.items()}
+
+
+def encode_move(origin: int, target: int, flags: int = 0, promotion: int = 0) -> int:
+    return origin | (target << 6) | flags | (promotion << PROMOTION_SHIFT)
+
+
+def move_origin(move: int) -> int:
+    return move & 63
+
+
+def move_target(move: int) -> int:
+    return (move >> 6) & 63
+
+
+def move_promotion(move: int) -> int:
+    return move >> PROMOTION_SHIFT
+
+
+def square_name(square: int) -> str:
+    return "abcdefgh"[square & 7] + str(8 - (square >> 3))
+
+
+def move_to_uci(move: int) -> str:
+    """
+    move in UCI notation, e.g. 'e2e4' or 'e7e8q'
+    """
+    promotion = move >> PROMOTION_SHIFT
+    return square_name(move & 63) + square_name((move >> 6) & 63) + ("nbrq"[promotion - KNIGHT] if promotion else "")
+
+
+def to_chess_move(move: int, color: ChessColor) -> ChessMove:
+    """
+    converts an internal move into a ChessMove
+    """
+    origin, target = move & 63, (move >> 6) & 63
+    promotion = move >> PROMOTION_SHIFT
+
+    castling = None
+    if move & CASTLING:
+        castling = ChessCastling.KINGSIDE if target > origin else ChessCastling.QUEENSIDE
+
+    return ChessMove(
+        origin=Coordinate(x=origin & 7, y=origin >> 3),
+        target=Coordinate(x=target & 7, y=target >> 3),
+        color=color,
+        promotion=promotion_pieces[promotion] if promotion else None,
+        castling=castling,
+        en_passant=bool(move & EN_PASSANT),
+        double_move=bool(move & DOUBLE_PAWN_MOVE)
+    )
+
+
+def from_chess_move(chess_move: ChessMove, position) -> int:
+    """
+    converts a ChessMove into an internal move. The flags are read from the position
+    the move is played in, so ChessMoves without them (e.g. from long_algebraic_to_move) work as well
+    """
+    origin = chess_move.origin.y * 8 + chess_move.origin.x
+    target = chess_move.target.y * 8 + chess_move.target.x
+    piece = position.squares[origin]
+    if piece is None:
+        raise ValueError(f"No piece on the origin square of {chess_move}")
+
+    kind = piece_kind(piece)
+    flags = CAPTURE if position.squares[target] is not None else 0
+    if kind == PAWN:
+        if abs(target - origin) == 16:
+            flags |= DOUBLE_PAWN_MOVE
+        elif (target - origin) % 8 != 0 and position.squares[target] is None:
+            flags |= CAPTURE | EN_PASSANT
+    elif kind == KING and abs(target - origin) == 2:
+        flags |= CASTLING
+
+    promotion = 0
+    if chess_move.promotion is not None:
+        promotion = promotion_kinds[chess_move.promotion]
+    return encode_move(origin, target, flags, promotion)
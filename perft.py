@@ -0,0 +1,138 @@
+from position import Position, START_FEN
+from movegen import get_legal_moves
+from moves import move_to_uci
+from array import array
+import multiprocessing
+import argparse
+import time
+
+"""
+Perft (performance test): counts the leaf nodes of the legal move tree up to a depth.
+https://www.chessprogramming.org/Perft
+
+    perft(position, depth)         - plain recursive count, with bulk counting at the last ply
+    perft_divide(position, depth)  - count per root move, the root moves can be spread over a process pool
+
+Both can use a PerftCache, which stores subtree counts by zobrist key and depth, so transpositions
+are only counted once. Run 'python perft.py "<fen>" <depth>' for a divide from the command line.
+"""
+
+
+DEPTH_BITS = 8
+DEPTH_MASK = (1 << DEPTH_BITS) - 1
+
+
+
+class PerftCache():
+    """
+    Always-replace hash table of subtree counts. Each slot holds the zobrist key with the depth
+    in its low bits, and the count. A different depth or key is simply a miss.
+    """
+
+    def __init__(self, size_mb: int = 16) -> None:
+        slots = max(1, (size_mb * 1024 * 1024) // 16)
+        slots = 1 << (slots.bit_length() - 1)
+        self.mask = slots - 1
+        self.keys = array("Q", bytes(slots * 8))
+        self.counts = array("Q", bytes(slots * 8))
+        self.hits = 0
+
+
+    def probe(self, key: int, depth: int) -> int | None:
+        index = (key ^ depth) & self.mask
+        if self.keys[index] == (key & ~DEPTH_MASK) | depth:
+            self.hits += 1
+            return self.counts[index]
+        return None
+
+
+    def store(self, key: int, depth: int, count: int) -> None:
+        index = (key ^ depth) & self.mask
+        self.keys[index] = (key & ~DEPTH_MASK) | depth
+        self.counts[index] = count
+
+
+
+def perft(position: Position, depth: int, cache: PerftCache | None = None) -> int:
+    if depth == 0:
+        return 1
+
+    moves = get_legal_moves(position, position.turn)
+    if depth == 1:
+        return len(moves)
+
+    if cache is not None:
+        count = cache.probe(position.hash, depth)
+        if count is not None:
+            return count
+
+    total = 0
+    for move in moves:
+        position.move(move)
+        total += perft(position, depth - 1, cache)
+        position.undo_move(move)
+
+    if cache is not None:
+        cache.store(position.hash, depth, total)
+    return total
+
+
+
+# every pool process keeps one cache for all the subtrees it counts
+_worker_cache: PerftCache | None = None
+
+def _init_worker(cache_mb: int) -> None:
+    global _worker_cache
+    _worker_cache = PerftCache(cache_mb) if cache_mb else None
+
+
+def _count_subtree(task: tuple[Position, int, int]) -> tuple[int, int]:
+    position, move, depth = task
+    position.move(move)
+    return move, perft(position, depth - 1, _worker_cache)
+
+
+
+def perft_divide(position: Position, depth: int, processes: int = 1, cache_mb: int = 0) -> dict[int, int]:
+    """
+    counts the leaf nodes below every root move. Returns {move: count} in move generation order.
+
+    processes > 1 counts the root moves in a process pool (None uses all cores),
+    cache_mb > 0 gives every process a PerftCache of that size
+    """
+    moves = get_legal_moves(position, position.turn)
+    if depth <= 0:
+        return {}
+
+    if processes == 1:
+        cache = PerftCache(cache_mb) if cache_mb else None
+        counts = {}
+        for move in moves:
+            position.move(move)
+            counts[move] = perft(position, depth - 1, cache)
+            position.undo_move(move)
+        return counts
+
+    # results come back in any order, so a process is never idle waiting for a big subtree
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(cache_mb,)) as pool:
+        results = dict(pool.imap_unordered(_count_subtree, [(position, move, depth) for move in moves]))
+    return {move: results[move] for move in moves}
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="perft divide of a position")
+    parser.add_argument("fen", nargs="?", default=START_FEN)
+    parser.add_argument("depth", nargs="?", type=int, default=4)
+    parser.add_argument("-p", "--processes", type=int, default=None, help="pool size (default: all cores)")
+    parser.add_argument("-c", "--cache-mb", type=int, default=0, help="subtree cache per process")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = perft_divide(Position(args.fen), args.depth, args.processes, args.cache_mb)
+    elapsed = time.perf_counter() - start
+
+    for move, count in counts.items():
+        print(f"{move_to_uci(move)}: {count}")
+    total = sum(counts.values())
+    print(f"\nNodes: {total}  Time: {elapsed:.2f}s  NPS: {int(total / elapsed) if elapsed > 0 else 0}")
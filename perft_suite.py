@@ -0,0 +1,198 @@
+from position import Position
+from movegen import generate_moves
+from perft import perft, perft_divide
+from datetime import datetime, timezone
+import subprocess
+import platform
+import argparse
+import json
+import time
+import sys
+import os
+
+"""
+Perft regression and throughput suite.
+
+Checks the node counts of the standard perft positions (https://www.chessprogramming.org/Perft_Results)
+and measures the speed of generate_moves and Position.move/undo_move. Every run is appended to a
+JSON history; a run that is slower than the previous one by more than the tolerance counts as failed,
+just like a wrong node count.
+
+    python perft_suite.py                   # depths up to 1M nodes per position
+    python perft_suite.py --max-nodes 5e6 -p 4
+"""
+
+
+HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perft_history.json")
+THROUGHPUT_SECONDS = 1.0
+SLOWDOWN_TOLERANCE = 0.2
+
+# name, fen, node counts for depth 1, 2, ...
+perft_suite = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        [20, 400, 8902, 197281, 4865609, 119060324]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039, 97862, 4085603, 193690690]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        [14, 191, 2812, 43238, 674624, 11030083]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467, 422333, 15833292]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        [44, 1486, 62379, 2103487, 89941194]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079, 89890, 3894594, 164075551]),
+]
+
+
+def run_perft(max_nodes: int = 1_000_000, processes: int = 1, cache_mb: int = 0) -> list[dict]:
+    """
+    runs every position to the deepest depth with at most max_nodes nodes
+    """
+    results = []
+    for name, fen, expected in perft_suite:
+        depth = max([d for d, count in enumerate(expected, 1) if count <= max_nodes], default=1)
+        position = Position(fen)
+
+        start = time.perf_counter()
+        if processes == 1 and not cache_mb:
+            nodes = perft(position, depth)
+        else:
+            nodes = sum(perft_divide(position, depth, processes, cache_mb).values())
+        seconds = time.perf_counter() - start
+
+        results.append({
+            "name": name,
+            "depth": depth,
+            "nodes": nodes,
+            "expected": expected[depth - 1],
+            "seconds": round(seconds, 3),
+            "nps": int(nodes / seconds) if seconds > 0 else 0,
+        })
+    return results
+
+
+
+def _throughput(work, seconds: float) -> float:
+    """
+    calls work() (which returns how many operations it did) until the time is up, returns operations per second
+    """
+    done, start = 0, time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        done += work()
+    return done / elapsed
+
+
+def generate_moves_throughput(seconds: float = THROUGHPUT_SECONDS) -> float:
+    """
+    generated (and ordered) moves per second over the suite positions
+    """
+    positions = [Position(fen) for _, fen, _ in perft_suite]
+    return _throughput(lambda: sum(len(generate_moves(position, position.turn)) for position in positions), seconds)
+
+
+def move_undo_throughput(seconds: float = THROUGHPUT_SECONDS) -> float:
+    """
+    move + undo_move pairs per second, for every legal move of the suite positions
+    """
+    positions = [(position, generate_moves(position, position.turn)) for position in (Position(fen) for _, fen, _ in perft_suite)]
+
+    def work() -> int:
+        count = 0
+        for position, moves in positions:
+            for move in moves:
+                position.move(move)
+                position.undo_move(move)
+            count += len(moves)
+        return count
+
+    return _throughput(work, seconds)
+
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: str = HISTORY_FILE) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_history(history: list[dict], path: str = HISTORY_FILE) -> None:
+    with open(path, "w") as file:
+        json.dump(history, file, indent=2)
+
+
+
+def run_suite(max_nodes: int = 1_000_000, processes: int = 1, cache_mb: int = 0, throughput_seconds: float = THROUGHPUT_SECONDS) -> dict:
+    """
+    runs perft and the throughput measurements, returns one history entry
+    """
+    perft_results = run_perft(max_nodes, processes, cache_mb)
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "processes": processes,
+        "cache_mb": cache_mb,
+        "perft": perft_results,
+        "generate_moves_per_second": int(generate_moves_throughput(throughput_seconds)),
+        "move_undo_per_second": int(move_undo_throughput(throughput_seconds)),
+    }
+
+
+def find_problems(entry: dict, previous: dict | None, tolerance: float = SLOWDOWN_TOLERANCE) -> list[str]:
+    """
+    wrong node counts, and throughput numbers that dropped by more than tolerance since the previous comparable run
+    """
+    problems = [f"{r['name']} depth {r['depth']}: {r['nodes']} nodes, expected {r['expected']}"
+                for r in entry["perft"] if r["nodes"] != r["expected"]]
+    if previous is None:
+        return problems
+
+    for key in ("generate_moves_per_second", "move_undo_per_second"):
+        if entry[key] < previous[key] * (1 - tolerance):
+            problems.append(f"{key} dropped from {previous[key]} to {entry[key]}")
+
+    old_perft = {(r["name"], r["depth"]): r for r in previous["perft"]}
+    for r in entry["perft"]:
+        old = old_perft.get((r["name"], r["depth"]))
+        if old is not None and r["nps"] < old["nps"] * (1 - tolerance):
+            problems.append(f"{r['name']} depth {r['depth']}: perft nps dropped from {old['nps']} to {r['nps']}")
+    return problems
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="perft regression and throughput suite")
+    parser.add_argument("--max-nodes", type=float, default=1_000_000, help="deepest depth per position with at most this many nodes")
+    parser.add_argument("-p", "--processes", type=int, default=1)
+    parser.add_argument("-c", "--cache-mb", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=SLOWDOWN_TOLERANCE, help="allowed slowdown against the previous run")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--no-save", action="store_true", help="don't append this run to the history")
+    args = parser.parse_args()
+
+    entry = run_suite(int(args.max_nodes), args.processes, args.cache_mb)
+    for r in entry["perft"]:
+        status = "OK" if r["nodes"] == r["expected"] else f"FAILED (expected {r['expected']})"
+        print(f"{r['name']:<12} depth {r['depth']}  {r['nodes']:>10} nodes  {r['seconds']:>7.2f}s  {r['nps']:>8} nps  {status}")
+    print(f"generate_moves: {entry['generate_moves_per_second']} moves/s")
+    print(f"move/undo_move: {entry['move_undo_per_second']} moves/s")
+
+    history = load_history(args.history)
+    # only runs with the same setup are compared, a different pool size is not a regression
+    previous = next((old for old in reversed(history) if (old["processes"], old["cache_mb"]) == (args.processes, args.cache_mb)), None)
+    problems = find_problems(entry, previous, args.tolerance)
+    if not args.no_save:
+        save_history(history + [entry], args.history)
+
+    for problem in problems:
+        print(problem)
+    sys.exit(1 if problems else 0)
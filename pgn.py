@@ -0,0 +1,367 @@
+from position import Position, START_FEN
+from schemas import MoveStats, PgnGame
+from movegen import get_legal_moves
+from moves import CASTLING, PROMOTION_SHIFT, move_to_uci
+from bitboards import PAWN, PIECE_CHARS, pawn_attacks
+from zobrist import en_passant_keys
+from utils import find_records
+from typing import Iterable, Iterator
+import multiprocessing
+import tempfile
+import argparse
+import struct
+import heapq
+import mmap
+import sys
+import os
+import re
+
+"""
+PGN reading and a position statistics index built from PGN archives.
+
+Games are streamed: read_games() is a generator that only ever holds one game in memory.
+The moves are given in SAN (standard algebraic notation, e.g. 'Nbd7', 'exd6', 'e8=Q+', 'O-O')
+and resolved against the legal moves of the position (san_to_move).
+
+build_index() replays the games in a process pool and writes, for every position and move played
+in it, how often it was played and the results of those games. The index is a file of records
+sorted by position hash (see position_key), so PositionIndex can search it in place without loading it.
+
+    python pgn.py index games.pgn more.pgn -o games.idx -p 8 --max-plies 30
+    python pgn.py query games.idx "<fen>"
+"""
+
+
+
+# index file: magic, then records of position hash, compact move, games, white wins, draws, black wins
+INDEX_MAGIC = b"PGNIDX1\0"
+RECORD = struct.Struct("<QHIIII")
+
+# games per task of the process pool, and how many sorted runs are merged at once
+BATCH_GAMES = 2000
+MAX_MERGE_FILES = 128
+
+results_map = {"1-0": 0, "1/2-1/2": 1, "0-1": 2} # index of the counter that a result increases
+
+san_re = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$")
+token_re = re.compile(r"\{[^}]*\}?|;[^\n]*|\(|\)|\$\d+|[^\s(){};$]+")
+move_number_re = re.compile(r"^\d+\.*")
+
+
+
+def _in_comment_after(line: str, in_comment: bool) -> bool:
+    """
+    whether a {...} comment is still open at the end of a movetext line
+    """
+    for char in line:
+        if in_comment:
+            in_comment = char != "}"
+        elif char == "{":
+            in_comment = True
+        elif char == ";":
+            break # the rest of the line is a comment, braces in it don't count
+    return in_comment
+
+
+def iter_game_texts(lines: Iterable[str]) -> Iterator[str]:
+    """
+    splits a stream of PGN lines into the raw text of single games
+    """
+    game: list[str] = []
+    in_movetext = in_comment = False
+    for line in lines:
+        if line.startswith("%") and not in_comment:
+            continue # escaped line
+        stripped = line.strip()
+        # wrapped comments may have lines that start with '[', like '[%clk 0:03:00]'
+        if stripped.startswith("[") and in_movetext and not in_comment:
+            yield "".join(game)
+            game, in_movetext = [], False
+        elif in_comment or (stripped and not stripped.startswith("[")):
+            in_movetext = True
+            in_comment = _in_comment_after(line, in_comment)
+        game.append(line if line.endswith("\n") else line + "\n")
+    if any(line.strip() for line in game):
+        yield "".join(game)
+
+
+def parse_game(text: str) -> PgnGame:
+    """
+    parses the raw text of one game
+    """
+    headers = {}
+    movetext = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]") and '"' in stripped and not movetext:
+            name, _, value = stripped[1:-1].partition(" ")
+            headers[name] = value.strip().strip('"')
+        else:
+            movetext.append(line)
+
+    moves, result, depth = [], headers.get("Result", "*"), 0
+    for token in token_re.findall("\n".join(movetext)):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth = max(0, depth - 1)
+        elif depth or token[0] in "{;$":
+            continue # variation, comment or NAG
+        elif token in ("1-0", "0-1", "1/2-1/2", "*"):
+            result = token
+        else:
+            san = move_number_re.sub("", token).rstrip("!?")
+            if san:
+                moves.append(san)
+    return PgnGame(headers, moves, result)
+
+
+def read_games(lines: Iterable[str]) -> Iterator[PgnGame]:
+    """
+    streams the games of a PGN source (e.g. an open file)
+    """
+    for text in iter_game_texts(lines):
+        yield parse_game(text)
+
+
+
+def san_to_move(position: Position, san: str) -> int:
+    """
+    the legal move of the side to move that a SAN string describes
+    """
+    san = san.rstrip("+#!?")
+    moves = get_legal_moves(position, position.turn)
+
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        kingside = len(san) == 3
+        for move in moves:
+            if move & CASTLING and (((move >> 6) & 63) > (move & 63)) == kingside:
+                return move
+        raise ValueError(f"Illegal castling: {san}")
+
+    match = san_re.match(san)
+    if match is None:
+        raise ValueError(f"Invalid SAN: {san}")
+    piece, from_file, from_rank, target, promotion = match.groups()
+    kind = PIECE_CHARS.index(piece.lower()) if piece else PAWN
+    target_square = (8 - int(target[1])) * 8 + "abcdefgh".index(target[0])
+    promotion_kind = PIECE_CHARS.index(promotion.lower()) if promotion else 0
+
+    found = []
+    for move in moves:
+        origin = move & 63
+        if (move >> 6) & 63 != target_square or position.squares[origin] % 6 != kind or move >> PROMOTION_SHIFT != promotion_kind:
+            continue
+        if from_file is not None and origin & 7 != "abcdefgh".index(from_file):
+            continue
+        if from_rank is not None and 8 - (origin >> 3) != int(from_rank):
+            continue
+        found.append(move)
+
+    if len(found) != 1:
+        raise ValueError(f"{'Ambiguous' if found else 'Illegal'} move: {san}")
+    return found[0]
+
+
+def position_key(position: Position) -> int:
+    """
+    the hash of a position as used in the index. Position.hash includes the en passant file after
+    every double pawn move, here it only counts if a pawn can capture, so the same position
+    reached by other moves (or set up from a FEN) gets the same key
+    """
+    ep = position.en_passant_square
+    color = position.turn.value
+    if ep is not None and not pawn_attacks[1 - color][ep] & position.bitboards[color * 6 + PAWN]:
+        return position.hash ^ en_passant_keys[ep & 7]
+    return position.hash
+
+
+def compact_move(move: int) -> int:
+    """
+    origin, target and promotion of a move in 16 bits, as stored in the index
+    """
+    return (move & 4095) | (move >> PROMOTION_SHIFT) << 12
+
+
+def replay(game: PgnGame, max_plies: int | None = None) -> Iterator[tuple[int, int]]:
+    """
+    (position hash, move) for every move of a game. Stops at the first move that can't be resolved
+    """
+    position = Position(game.headers.get("FEN", START_FEN))
+    for ply, san in enumerate(game.moves):
+        if max_plies is not None and ply >= max_plies:
+            break
+        move = san_to_move(position, san)
+        yield position_key(position), move
+        position.move(move)
+
+
+
+def _write_run(counts: dict[tuple[int, int], list[int]], path: str) -> None:
+    with open(path, "wb") as file:
+        for (key, move), (games, white, draws, black) in sorted(counts.items()):
+            file.write(RECORD.pack(key, move, games, white, draws, black))
+
+
+def _read_records(path: str) -> Iterator[tuple]:
+    with open(path, "rb") as file:
+        while chunk := file.read(RECORD.size * 4096):
+            yield from RECORD.iter_unpack(chunk)
+
+
+def _index_batch(task: tuple[list[str], int | None, str]) -> tuple[str, int, int]:
+    """
+    pool task: replays a batch of games into a sorted run file. Returns its path, the number of games and of broken games
+    """
+    texts, max_plies, run_dir = task
+    counts: dict[tuple[int, int], list[int]] = {}
+    errors = 0
+    for text in texts:
+        game = parse_game(text)
+        result = results_map.get(game.result)
+        try:
+            for key, move in replay(game, max_plies):
+                entry = counts.get((key, compact_move(move)))
+                if entry is None:
+                    entry = counts[(key, compact_move(move))] = [0, 0, 0, 0]
+                entry[0] += 1
+                if result is not None:
+                    entry[1 + result] += 1
+        except ValueError:
+            errors += 1 # the moves up to the broken one are kept
+
+    handle, path = tempfile.mkstemp(suffix=".run", dir=run_dir)
+    os.close(handle)
+    _write_run(counts, path)
+    return path, len(texts), errors
+
+
+def _merge_runs(paths: list[str], output: str, header: bytes = b"") -> None:
+    """
+    merges sorted run files into one, adding up the counts of equal (position, move) records
+    """
+    with open(output, "wb") as file:
+        file.write(header)
+        current, counts = None, [0, 0, 0, 0]
+        for key, move, *record in heapq.merge(*(_read_records(path) for path in paths)):
+            if (key, move) != current:
+                if current is not None:
+                    file.write(RECORD.pack(*current, *counts))
+                current, counts = (key, move), [0, 0, 0, 0]
+            counts = [a + b for a, b in zip(counts, record)]
+        if current is not None:
+            file.write(RECORD.pack(*current, *counts))
+
+
+def _batches(paths: Iterable[str], size: int) -> Iterator[list[str]]:
+    batch = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as file:
+            for text in iter_game_texts(file):
+                batch.append(text)
+                if len(batch) >= size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def build_index(pgn_paths: list[str], index_path: str, processes: int | None = None, max_plies: int | None = None,
+                batch_games: int = BATCH_GAMES) -> tuple[int, int]:
+    """
+    replays all games of the PGN files and writes the position index. Returns the number of games
+    and of games with a move that could not be resolved (their moves before it are counted).
+
+    The files are read as a stream, batches of games are replayed in a process pool
+    (processes=None uses all cores) and written as sorted runs, which are merged at the end.
+    """
+    games = errors = 0
+    with tempfile.TemporaryDirectory() as run_dir:
+        runs = []
+        tasks = ((batch, max_plies, run_dir) for batch in _batches(pgn_paths, batch_games))
+        with multiprocessing.Pool(processes) as pool:
+            for path, count, broken in pool.imap_unordered(_index_batch, tasks):
+                runs.append(path)
+                games += count
+                errors += broken
+
+        # merge in rounds, so there are never too many files open at once
+        while len(runs) > MAX_MERGE_FILES:
+            merged = []
+            for i in range(0, len(runs), MAX_MERGE_FILES):
+                handle, path = tempfile.mkstemp(suffix=".run", dir=run_dir)
+                os.close(handle)
+                _merge_runs(runs[i:i + MAX_MERGE_FILES], path)
+                merged.append(path)
+            runs = merged
+        _merge_runs(runs, index_path, INDEX_MAGIC)
+    return games, errors
+
+
+
+class PositionIndex():
+    """
+    read access to an index made by build_index, memory mapped. Use it as context manager or call close() at the end
+    """
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "rb")
+        if self.file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            self.file.close()
+            raise ValueError(f"Not a position index: {path}")
+        size = self.file.seek(0, 2)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.record_count = (size - len(INDEX_MAGIC)) // RECORD.size
+
+
+    def __enter__(self) -> "PositionIndex":
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        self.data.close()
+        self.file.close()
+
+
+    def records(self, key: int) -> list[tuple[int, int, int, int, int]]:
+        """
+        (compact move, games, white wins, draws, black wins) of a position hash
+        """
+        return [record[1:] for record in find_records(self.data, RECORD, key, len(INDEX_MAGIC), self.record_count)]
+
+
+    def lookup(self, position: Position) -> list[MoveStats]:
+        """
+        statistics of the moves played in a position, most played first
+        """
+        legal = {compact_move(move): move for move in get_legal_moves(position, position.turn)}
+        stats = [MoveStats(legal[move], *counts) for move, *counts in self.records(position_key(position)) if move in legal]
+        return sorted(stats, key=lambda entry: entry.games, reverse=True)
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="position statistics from PGN files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_parser = commands.add_parser("index", help="build an index from PGN files")
+    index_parser.add_argument("pgn", nargs="+")
+    index_parser.add_argument("-o", "--output", required=True)
+    index_parser.add_argument("-p", "--processes", type=int, default=None)
+    index_parser.add_argument("--max-plies", type=int, default=None, help="only index the first plies of every game")
+    query_parser = commands.add_parser("query", help="move statistics of a position")
+    query_parser.add_argument("index")
+    query_parser.add_argument("fen", nargs="?", default=START_FEN)
+    args = parser.parse_args()
+
+    if args.command == "index":
+        games, errors = build_index(args.pgn, args.output, args.processes, args.max_plies)
+        print(f"{games} games indexed, {errors} with unreadable moves")
+        sys.exit(0)
+
+    with PositionIndex(args.index) as index:
+        for entry in index.lookup(Position(args.fen)):
+            print(f"{move_to_uci(entry.move)}: {entry.games} games  +{entry.white_wins} ={entry.draws} -{entry.black_wins}")
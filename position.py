@@ -1,9 +1,34 @@
 from schemas import Pawn, Bishop, Knight, Rook, Queen, King
-from schemas import ChessColor, ChessMove, ChessCastling, Coordinate
-from utils import check_bounds
+from schemas import ChessColor, Coordinate
+from moves import CAPTURE, DOUBLE_PAWN_MOVE, EN_PASSANT, CASTLING, PROMOTION_SHIFT
+from bitboards import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, PIECE_CHARS
+from bitboards import knight_attacks, king_attacks, pawn_attacks, rook_attacks, bishop_attacks
+from bitboards import make_piece, piece_kind, piece_color
+from zobrist import piece_keys, side_key, castling_keys, en_passant_keys, compute_hash
+from psqt import piece_square_values, compute_psqt_scores
+from utils import coordinate_map_x, coordinate_map_y
 from typing import List
-import numpy as np
-import copy
+
+
+# castling rights are stored as bits of an int
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+ALL_CASTLING_RIGHTS = 15
+castling_chars = {"K": WHITE_KINGSIDE, "Q": WHITE_QUEENSIDE, "k": BLACK_KINGSIDE, "q": BLACK_QUEENSIDE}
+
+# castling rights that survive a move from or to a square (only king and rook squares remove rights)
+castling_masks = [ALL_CASTLING_RIGHTS] * 64
+castling_masks[60] ^= WHITE_KINGSIDE | WHITE_QUEENSIDE # e1
+castling_masks[63] ^= WHITE_KINGSIDE # h1
+castling_masks[56] ^= WHITE_QUEENSIDE # a1
+castling_masks[4] ^= BLACK_KINGSIDE | BLACK_QUEENSIDE # e8
+castling_masks[7] ^= BLACK_KINGSIDE # h8
+castling_masks[0] ^= BLACK_QUEENSIDE # a8
+
+# standard chess starting position
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# maximal number of moves on the state stack before it has to grow
+STACK_CAPACITY = 1024
 
 
 class Position():
@@ -11,6 +36,9 @@ class Position():
     Represents a chess Position.
     Implements functionality to manipulate the position such as move(), fen_to_position()...
     Is compatible with FEN-Notation and the long-algebraic-notation
+
+    The board is stored as bitboards (one python int per piece type and color, see bitboards.py)
+    plus a 64 element list 'squares' that maps every square to its piece code (or None).
     """
     # for mapping fen characters to our objects:
     fen_map = {
@@ -22,265 +50,410 @@ class Position():
         "k": King
     }
 
+    # one shared piece object per piece code, used by board / get_piece for the GUI
+    piece_objects = [
+        piece_class(color)
+        for color in (ChessColor.BLACK, ChessColor.WHITE)
+        for piece_class in (Pawn, Knight, Bishop, Rook, Queen, King) # same order as PIECE_CHARS
+    ]
 
 
-    # Move directions/offsets for every piece
-    N, E, S, W = np.array([0, -1]), np.array([1, 0]), np.array([0, 1]), np.array([-1, 0])
 
-    move_directions = {
-        "p" : (N, N+N, N+E, N+W),
-        "n" : (N+N+E, N+N+W, E+E+N, E+E+S, S+S+E, S+S+W, W+W+N, W+W+S),
-        "b" : (N+E, N+W, S+E, S+W),
-        "r" : (N, E, S, W),
-        "q" : (N, E, S, W, N+E, N+W, S+E, S+W),
-        "k" : (N, E, S, W, N+E, N+W, S+E, S+W)
-    }
+    def __init__(self, fen: str, debug_hash: bool = False) -> None:
+        # Bitboards, indexed by piece code (see bitboards.make_piece)
+        self.bitboards: List[int] = [0] * 12
 
-    # Need this extra Dictionary because Pawns are the only pieces
-    # that are able to move without attacking (N, N+N). These moves
-    # are intentionally left out of here.
-    attack_directions = {
-        "p" : (N+E, N+W),
-        "n" : (N+N+E, N+N+W, E+E+N, E+E+S, S+S+E, S+S+W, W+W+N, W+W+S),
-        "b" : (N+E, N+W, S+E, S+W),
-        "r" : (N, E, S, W),
-        "q" : (N, E, S, W, N+E, N+W, S+E, S+W),
-        "k" : (N, E, S, W, N+E, N+W, S+E, S+W)
-    }
+        # Occupancy per color (indexed by ChessColor.value) and for both colors together
+        self.occupancy: List[int] = [0, 0]
+        self.occupied: int = 0
 
+        # Piece code on every square, or None for an empty square
+        self.squares: List[int | None] = [None] * 64
 
+        # List of all current legal moves
+        self.legal_moves: List[int]
 
-    def __init__(self, fen: str) -> None:
-        # Chess Board
-        # A 2D Array. Each element is either None, or a piece Object
-        self.board: List[List[None | Pawn | Knight | Bishop | Rook | Queen | King]] = [[None for _ in range(8)] for x in range(8)]
+        # Color whose turn it is, flipped by every move() / undo_move()
+        self.turn: ChessColor = ChessColor.WHITE
 
-        # List of all current legal moves
-        self.legal_moves: List[ChessMove]
+        # When a Pawn double moves, the square in the middle will be stored here (allows simple en passant logic)
+        self.en_passant_square: int | None = None
+
+        # castling rights as 4 bits (WHITE_KINGSIDE | WHITE_QUEENSIDE | BLACK_KINGSIDE | BLACK_QUEENSIDE)
+        self.castling_rights: int = ALL_CASTLING_RIGHTS
+
+        # halfmoves since the last capture or pawn move, and number of the current fullmove
+        self.halfmove_clock: int = 0
+        self.fullmove_number: int = 1
+
+        # State stack: move() saves everything here that undo_move() can't recompute from the move itself.
+        # The lists are allocated once, 'ply' is the number of moves on the stack.
+        self.ply: int = 0
+        self.stack_captured: List[int | None] = [None] * STACK_CAPACITY
+        self.stack_en_passant: List[int | None] = [None] * STACK_CAPACITY
+        self.stack_castling: List[int] = [0] * STACK_CAPACITY
+        self.stack_halfmove: List[int] = [0] * STACK_CAPACITY
+        self.stack_hash: List[int] = [0] * STACK_CAPACITY
+        self.stack_move: List[int] = [0] * STACK_CAPACITY # the moves themselves, for the search heuristics
+
+        # Zobrist hash of the position (see zobrist.py), updated incrementally by move() / undo_move()
+        self.hash: int = 0
 
-        # List of all attacked fields
-        self.attacked_fields_black: List[Coordinate]
-        self.attacked_fields_white: List[Coordinate]
+        # material + piece-square score per color (see psqt.py), updated incrementally like the hash
+        self.psqt_scores: List[float] = [0.0, 0.0]
+
+        # if True, every move() / undo_move() compares the incremental hash against a full recomputation
+        self.debug_hash = debug_hash
 
         self.fen = fen
-        # Set starting position 
+        # Set starting position
         self.fen_to_position(self.fen)
 
-        # When a Pawn double moves, the square in the middle will be stored here (allows simple en passant logic)
-        self.en_passant_square: Coordinate | None = None
 
-        # dict for storing castling rights
-        self.castling_rights = {
-            ChessColor.WHITE : {"kingside" : True, 'queenside' : True},
-            ChessColor.BLACK : {"kingside" : True, 'queenside' : True}
-        }
+    @property
+    def board(self) -> List[List[None | Pawn | Knight | Bishop | Rook | Queen | King]]:
+        """
+        8x8 view of the position with piece objects (None for empty squares), e.g. for drawing it
+        """
+        objects = self.piece_objects
+        return [
+            [None if piece is None else objects[piece] for piece in self.squares[y * 8 : y * 8 + 8]]
+            for y in range(8)
+        ]
 
 
     def get_piece(self, coor: Coordinate) -> None | Pawn | Knight | Bishop | Rook | Queen | King:
-        return self.board[coor.y][coor.x]
+        piece = self.squares[coor.y * 8 + coor.x]
+        return None if piece is None else self.piece_objects[piece]
 
     ###############################################################################
-    # Check how many squares are threatened by both colors. Threatened does not 
-    # necessairily mean that there is a piece on that square!
+    # Low level board manipulation. Every change of the board goes through these
+    # three methods, so squares, bitboards and occupancy always stay in sync.
     ###############################################################################
 
-    def update_attacked_fields(self) -> None:
-        attacked_fields_black: List[Coordinate] = []
-        attacked_fields_white: List[Coordinate] = []
-
-        for y, row in enumerate(self.board):
-            for x, col in enumerate(row):
-                piece = self.board[y][x]
-                if piece == None:
-                    continue
-
-                #PIECE FOUND
-                else:
-                    kind = piece.fen_char.lower()
-                    attack_list = (
-                        attacked_fields_white if piece.color == ChessColor.WHITE else attacked_fields_black
-                    )
-                    offsets = self.attack_directions[kind]
-
-                    for dx, dy in offsets:
-                        if kind in ("p", "n", "k"): # Pieces with fixed movements
-                            n_dy = dy
-                            if kind == "p" and piece.color == ChessColor.BLACK:
-                                n_dy = -dy  # invert pawn direction (for black pawns)
-
-                            new_x, new_y = x + dx, y + n_dy
-                            if 0 <= new_x < 8 and 0 <= new_y < 8:
-                                attack_list.append(Coordinate(x=new_x, y=new_y))
+    def _add_piece(self, square: int, piece: int) -> None:
+        bit = 1 << square
+        self.hash ^= piece_keys[piece][square]
+        self.psqt_scores[piece // 6] += piece_square_values[piece][square]
+        self.squares[square] = piece
+        self.bitboards[piece] |= bit
+        self.occupancy[piece // 6] |= bit
+        self.occupied |= bit
+
+
+    def _remove_piece(self, square: int) -> int:
+        piece = self.squares[square]
+        bit = 1 << square
+        self.hash ^= piece_keys[piece][square]
+        self.psqt_scores[piece // 6] -= piece_square_values[piece][square]
+        self.squares[square] = None
+        self.bitboards[piece] ^= bit
+        self.occupancy[piece // 6] ^= bit
+        self.occupied ^= bit
+        return piece
+
+
+    def _move_piece(self, origin: int, target: int) -> None:
+        piece = self.squares[origin]
+        bits = (1 << origin) | (1 << target)
+        keys = piece_keys[piece]
+        self.hash ^= keys[origin] ^ keys[target]
+        values = piece_square_values[piece]
+        self.psqt_scores[piece // 6] += values[target] - values[origin]
+        self.squares[origin] = None
+        self.squares[target] = piece
+        self.bitboards[piece] ^= bits
+        self.occupancy[piece // 6] ^= bits
+        self.occupied ^= bits
+
+    def verify_hash(self) -> None:
+        """
+        Raises a RuntimeError if the incremental hash (or the piece-square scores) differ from a full recomputation
+        """
+        expected = compute_hash(self)
+        if self.hash != expected:
+            raise RuntimeError(f"Zobrist hash out of sync: {self.hash:016x} != {expected:016x}")
+        expected_scores = compute_psqt_scores(self)
+        if self.psqt_scores != expected_scores:
+            raise RuntimeError(f"Piece-square scores out of sync: {self.psqt_scores} != {expected_scores}")
 
-                        else: # Sliding Pieces
-                            new_x, new_y = x + dx, y + dy
-                            # Multiple attacked fields in the same direction
-                            while 0 <= new_x < 8 and 0 <= new_y < 8:
-                                attack_list.append(Coordinate(x=new_x, y=new_y))
-                                if self.board[new_y][new_x] is not None:
-                                    break # Piece blocks
-                                new_x += dx
-                                new_y += dy
+    ###############################################################################
+    # Attack detection, based on the precomputed attack tables in bitboards.py
+    ###############################################################################
 
-        self.attacked_fields_black = attacked_fields_black
-        self.attacked_fields_white = attacked_fields_white
+    def is_square_attacked(self, square: int, by_color: int) -> bool:
+        """
+        True if a piece of by_color (a color value, bitboards.WHITE / BLACK) attacks the square.
+        Works for empty and taken squares.
+        """
+        bitboards = self.bitboards
+        base = by_color * 6
+
+        if knight_attacks[square] & bitboards[base + KNIGHT]:
+            return True
+        # a pawn attacks our square if a pawn of the other color on our square would attack it
+        if pawn_attacks[by_color ^ 1][square] & bitboards[base + PAWN]:
+            return True
+        if king_attacks[square] & bitboards[base + KING]:
+            return True
+
+        queens = bitboards[base + QUEEN]
+        rooks = bitboards[base + ROOK] | queens
+        if rooks and rook_attacks(square, self.occupied) & rooks:
+            return True
+        bishops = bitboards[base + BISHOP] | queens
+        if bishops and bishop_attacks(square, self.occupied) & bishops:
+            return True
+        return False
+
+
+    def attackers_to(self, square: int, occupied: int) -> int:
+        """
+        bitboard of all pieces (of both colors) that attack the square, with sliders
+        blocked by 'occupied'. Passing a different occupancy lets callers look through pieces.
+        """
+        b = self.bitboards
+        rooks = b[ROOK] | b[QUEEN] | b[6 + ROOK] | b[6 + QUEEN]
+        bishops = b[BISHOP] | b[QUEEN] | b[6 + BISHOP] | b[6 + QUEEN]
+        return ((knight_attacks[square] & (b[KNIGHT] | b[6 + KNIGHT]))
+                | (king_attacks[square] & (b[KING] | b[6 + KING]))
+                | (pawn_attacks[WHITE][square] & b[BLACK * 6 + PAWN])
+                | (pawn_attacks[BLACK][square] & b[WHITE * 6 + PAWN])
+                | (rook_attacks(square, occupied) & rooks)
+                | (bishop_attacks(square, occupied) & bishops))
+
+
+    def in_check(self, color: int) -> bool:
+        """
+        True if the king of color (a color value) is attacked
+        """
+        king = self.bitboards[color * 6 + KING]
+        return bool(king) and self.is_square_attacked(king.bit_length() - 1, color ^ 1)
 
 
 
-    def move(self, move: ChessMove) -> None | Pawn | Bishop | Knight | Rook | Queen:
+    def move(self, move: int) -> None:
         """
-        Play a ChessMove on the board, returns captured piece if any
+        Play a move (see moves.py) on the board. Everything undo_move() needs
+        to take it back is pushed onto the state stack.
         """
-
-        piece = self.board[move.origin.y][move.origin.x]
+        origin = move & 63
+        target = (move >> 6) & 63
+        piece = self.squares[origin]
 
         if piece is None:
             print("ERROR: Tried to move from empty square", move)
             self.print_board()
             return
 
-        p_type = piece.fen_char
-        color = piece.color
+        # save state
+        ply = self.ply
+        if ply == len(self.stack_hash):
+            self._grow_stack()
+        self.stack_hash[ply] = self.hash
+        self.stack_move[ply] = move
+        self.stack_castling[ply] = self.castling_rights
+        self.stack_en_passant[ply] = self.en_passant_square
+        self.stack_halfmove[ply] = self.halfmove_clock
         captured_piece = None
 
-        move.prev_en_passant_square = self.en_passant_square
-        move.prev_castling_rights = copy.deepcopy(self.castling_rights)
+        if self.en_passant_square is not None:
+            self.hash ^= en_passant_keys[self.en_passant_square & 7]
+            self.en_passant_square = None # RESET last en passant square
+        self.halfmove_clock += 1
 
-        def regular_move(origin: Coordinate, target: Coordinate):
-            n_piece = self.board[origin.y][origin.x]
-            self.board[origin.y][origin.x] = None
-            self.board[target.y][target.x] = n_piece
+        # Capture
+        if move & CAPTURE:
+            if move & EN_PASSANT:
+                # the captured pawn stands next to the origin, on the file of the target
+                captured_piece = self._remove_piece((origin & 56) | (target & 7))
+            else:
+                captured_piece = self._remove_piece(target)
+            self.halfmove_clock = 0
 
-        if p_type in ("b", "n", "q", "r"):
-            captured_piece = self.board[move.target.y][move.target.x]
-            regular_move(move.origin, move.target) 
-            if p_type == "r":  
-                # set castling rights to false
-                if self.castling_rights[color]["kingside"] and move.origin.x == 7:
-                    self.castling_rights[color]["kingside"] = False
-                elif self.castling_rights[color]["queenside"] and move.origin.x == 0:
-                    self.castling_rights[color]["queenside"] = False
+        self._move_piece(origin, target)
 
-        elif p_type == "p":
-            if not move.en_passant:
-                captured_piece = self.board[move.target.y][move.target.x]
+        if piece % 6 == PAWN:
+            self.halfmove_clock = 0
 
             # Double Move - set en passant square
-            if move.double_move:
-                self.en_passant_square = Coordinate(x=move.target.x, y=move.target.y+1) if color == ChessColor.WHITE else Coordinate(x=move.target.x, y=move.target.y-1)
-                regular_move(move.origin, move.target)
-            else:
-                self.en_passant_square = None # RESET last en passant square
-                regular_move(move.origin, move.target)
+            if move & DOUBLE_PAWN_MOVE:
+                self.en_passant_square = (origin + target) >> 1
+                self.hash ^= en_passant_keys[target & 7]
 
             # Promotion
-            if move.promotion is not None:
-                self.board[move.target.y][move.target.x] = move.promotion.to_piece(color)
-
-            # En Passant
-            if move.en_passant:
-                cap_y = move.target.y + 1 if color == ChessColor.WHITE else move.target.y - 1
-                captured_piece = self.board[cap_y][move.target.x]
-                self.board[cap_y][move.target.x] = None
-
-        elif p_type == "k":
-            if move.castling is not None:
-                captured_piece = self.board[move.target.y][move.target.x]
-                regular_move(move.origin, move.target)
-                rk_move: ChessMove
-                if move.castling == ChessCastling.KINGSIDE:
-                    # rook-kingside moves as well:
-                    rk_move = ChessMove(
-                        origin=Coordinate(x=move.origin.x+3, y=move.origin.y),
-                        target=Coordinate(x=move.origin.x+1, y=move.origin.y),
-                        color=color
-                    )
-                else:
-                    # rook-queenside moves as well:
-                    rk_move = ChessMove(
-                        origin=Coordinate(x=move.origin.x-4, y=move.origin.y),
-                        target=Coordinate(x=move.origin.x-1, y=move.origin.y),
-                        color=color
-                    )
-                # finally, move rook over king
-                regular_move(rk_move.origin, rk_move.target)
+            elif move >> PROMOTION_SHIFT:
+                self._remove_piece(target)
+                self._add_piece(target, make_piece(move >> PROMOTION_SHIFT, piece // 6))
+
+        # Castling - rook moves over the king as well
+        elif move & CASTLING:
+            if target > origin:
+                self._move_piece(origin + 3, origin + 1)
             else:
-            # no castling:
-                captured_piece = self.board[move.target.y][move.target.x]
-                regular_move(move.origin, move.target)
-            self.castling_rights[color]["kingside"], self.castling_rights[color]["queenside"] = False, False # disable castling rights
-        return captured_piece
+                self._move_piece(origin - 4, origin - 1)
 
+        # moving from or to a king or rook square removes the castling rights that depend on it
+        rights = self.castling_rights
+        if rights:
+            new_rights = rights & castling_masks[origin] & castling_masks[target]
+            if new_rights != rights:
+                self.hash ^= castling_keys[rights] ^ castling_keys[new_rights]
+                self.castling_rights = new_rights
 
+        self.stack_captured[ply] = captured_piece
+        self.ply = ply + 1
 
+        if self.turn == ChessColor.WHITE:
+            self.turn = ChessColor.BLACK
+        else:
+            self.turn = ChessColor.WHITE
+            self.fullmove_number += 1
+        self.hash ^= side_key
 
-    def undo_move(self, move: ChessMove, captured_piece: None | Pawn | Bishop | Knight | Rook | Queen) -> None:
+        if self.debug_hash:
+            self.verify_hash()
+
+
+
+
+    def undo_move(self, move: int) -> None:
         """
-        Undoes a move. Needed for in-place search algorithm. Otherwise we would need thousands of position objects. 
+        Undoes the last move. Needed for in-place search algorithm. Otherwise we would need thousands of position objects.
         """
-        color = move.color
+        ply = self.ply - 1
+        self.ply = ply
+        origin = move & 63
+        target = (move >> 6) & 63
 
-        # restore states
-        self.en_passant_square = move.prev_en_passant_square
-        self.castling_rights = move.prev_castling_rights
+        if self.turn == ChessColor.WHITE:
+            self.turn = ChessColor.BLACK
+            self.fullmove_number -= 1
+        else:
+            self.turn = ChessColor.WHITE
 
         # === Promotion ===
-        if move.promotion is not None:
-            # remove promoted piece from target
-            self.board[move.target.y][move.target.x] = None
-            # restore original pawn on origin
-            self.board[move.origin.y][move.origin.x] = Pawn(color)
-            # if a piece was captured, restore it
-            if captured_piece:
-                self.board[move.target.y][move.target.x] = captured_piece
-            return
+        if move >> PROMOTION_SHIFT:
+            # remove promoted piece from target and restore original pawn on origin
+            self._remove_piece(target)
+            self._add_piece(origin, make_piece(PAWN, self.turn.value))
+        else:
+            self._move_piece(target, origin)
 
         # === Castling ===
-        if move.castling is not None:
-            # restore king
-            self.board[move.origin.y][move.origin.x] = self.board[move.target.y][move.target.x]
-            self.board[move.target.y][move.target.x] = None
-            # restore rook
-            origin_x_rook = 0 if move.castling == ChessCastling.QUEENSIDE else 7
-            rook_target_x = move.target.x - 1 if move.castling == ChessCastling.KINGSIDE else move.target.x + 1
-            self.board[move.target.y][origin_x_rook] = self.board[move.target.y][rook_target_x]
-            self.board[move.target.y][rook_target_x] = None
-            return
+        if move & CASTLING:
+            if target > origin:
+                self._move_piece(origin + 1, origin + 3)
+            else:
+                self._move_piece(origin - 1, origin - 4)
+
+        # === Captures ===
+        captured_piece = self.stack_captured[ply]
+        if captured_piece is not None:
+            if move & EN_PASSANT:
+                # restore captured pawn behind
+                self._add_piece((origin & 56) | (target & 7), captured_piece)
+            else:
+                self._add_piece(target, captured_piece)
+
+        # restore states
+        self.castling_rights = self.stack_castling[ply]
+        self.en_passant_square = self.stack_en_passant[ply]
+        self.halfmove_clock = self.stack_halfmove[ply]
+        self.hash = self.stack_hash[ply]
+
+        if self.debug_hash:
+            self.verify_hash()
+
+
+    def move_null(self) -> None:
+        """
+        Passes the turn without moving a piece (null move, used by the search).
+        Saved on the state stack like a move, take it back with undo_null_move()
+        """
+        ply = self.ply
+        if ply == len(self.stack_hash):
+            self._grow_stack()
+        self.stack_hash[ply] = self.hash
+        self.stack_move[ply] = 0
+        self.stack_castling[ply] = self.castling_rights
+        self.stack_en_passant[ply] = self.en_passant_square
+        self.stack_halfmove[ply] = self.halfmove_clock
+        self.stack_captured[ply] = None
+        self.ply = ply + 1
+
+        if self.en_passant_square is not None:
+            self.hash ^= en_passant_keys[self.en_passant_square & 7]
+            self.en_passant_square = None
+        self.halfmove_clock += 1
+        if self.turn == ChessColor.WHITE:
+            self.turn = ChessColor.BLACK
+        else:
+            self.turn = ChessColor.WHITE
+            self.fullmove_number += 1
+        self.hash ^= side_key
+
+
+    def undo_null_move(self) -> None:
+        ply = self.ply - 1
+        self.ply = ply
+        if self.turn == ChessColor.WHITE:
+            self.turn = ChessColor.BLACK
+            self.fullmove_number -= 1
+        else:
+            self.turn = ChessColor.WHITE
+        self.en_passant_square = self.stack_en_passant[ply]
+        self.halfmove_clock = self.stack_halfmove[ply]
+        self.hash = self.stack_hash[ply]
+
+
+
+    def _grow_stack(self) -> None:
+        """
+        doubles the capacity of the state stack (only happens in very long games)
+        """
+        for stack in (self.stack_captured, self.stack_en_passant, self.stack_castling, self.stack_halfmove, self.stack_hash, self.stack_move):
+            stack.extend(stack[:])
+
+
+
+    def last_move(self) -> int:
+        """
+        the move that led to this position, 0 (NO_MOVE) if there is none on the stack
+        """
+        return self.stack_move[self.ply - 1] if self.ply else 0
 
-        # === En Passant ===
-        if move.en_passant:
-            # restore moving pawn
-            self.board[move.origin.y][move.origin.x] = self.board[move.target.y][move.target.x]
-            self.board[move.target.y][move.target.x] = None
-            # restore captured pawn behind
-            y_cap = move.target.y + 1 if color == ChessColor.WHITE else move.target.y - 1
-            self.board[y_cap][move.target.x] = captured_piece
-            return
 
-        # === Normal move ===
-        self.board[move.origin.y][move.origin.x] = self.board[move.target.y][move.target.x]
-        self.board[move.target.y][move.target.x] = captured_piece
-            
 
-        
-        
     def fen_to_position(self, fen: str) -> None:
         """
         Translates a FEN into a chess position on the internal board.
         https://de.wikipedia.org/wiki/Forsyth-Edwards-Notation
 
-        TODO currently, only the board arrangements work. We also need to add the other 5 FEN fields (e.g. castling rights, turn_color...)
-
+        Reads all six fields. Missing fields keep their defaults
+        (white to move, all castling rights, no en passant square, clocks at 0 and 1).
         """
         row_index, col_index = 0, 0
-
-        for char in fen:
+        fields = fen.split()
+
+        self.bitboards = [0] * 12
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        self.squares = [None] * 64
+        self.psqt_scores = [0.0, 0.0]
+        self.ply = 0
+
+        # defaults for the missing fields, also when an existing position is loaded again
+        self.turn = ChessColor.WHITE
+        self.castling_rights = ALL_CASTLING_RIGHTS
+        self.en_passant_square = None
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+
+        for char in fields[0]:
             # Integer
             if char.isdigit():
-                num = int(char)
-                for i in range(num):
-                    self.board[row_index][col_index] = None
-                    col_index += 1
+                col_index += int(char)
                 continue
 
             # Slash
@@ -291,41 +464,75 @@ class Position():
 
             # Letter
             if char.lower() in self.fen_map:
-                piece_class = self.fen_map[char.lower()]
-                color = ChessColor.WHITE if char.isupper() else ChessColor.BLACK
-                self.board[row_index][col_index] = piece_class(color)
+                kind = PIECE_CHARS.index(char.lower())
+                color = WHITE if char.isupper() else BLACK
+                self._add_piece(row_index * 8 + col_index, make_piece(kind, color))
                 col_index += 1
 
+        # Active color
+        if len(fields) > 1:
+            self.turn = ChessColor.WHITE if fields[1] == "w" else ChessColor.BLACK
+
+        # Castling rights
+        if len(fields) > 2:
+            self.castling_rights = 0
+            for char, right in castling_chars.items():
+                if char in fields[2]:
+                    self.castling_rights |= right
+
+        # En passant square
+        if len(fields) > 3 and fields[3] != "-":
+            self.en_passant_square = coordinate_map_y[int(fields[3][1])] * 8 + coordinate_map_x[fields[3][0]]
+
+        # Clocks
+        if len(fields) > 4:
+            self.halfmove_clock = int(fields[4])
+        if len(fields) > 5:
+            self.fullmove_number = int(fields[5])
+
+        self.hash = compute_hash(self)
+
 
     def position_to_fen(self) -> str:
         """
-        Generates fen based on current position
+        Generates fen based on current position (all six fields)
         """
-        # TODO
-        pass
+        rows = []
+        for row_index in range(8):
+            row, empty = "", 0
+            for piece in self.squares[row_index * 8:row_index * 8 + 8]:
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                char = PIECE_CHARS[piece_kind(piece)]
+                row += char.upper() if piece_color(piece) == WHITE else char
+            rows.append(row + (str(empty) if empty else ""))
+
+        turn = "w" if self.turn == ChessColor.WHITE else "b"
+        castling = "".join(char for char, right in castling_chars.items() if self.castling_rights & right) or "-"
+        en_passant = "-"
+        if self.en_passant_square is not None:
+            en_passant = "abcdefgh"[self.en_passant_square & 7] + str(8 - (self.en_passant_square >> 3))
+        return f"{'/'.join(rows)} {turn} {castling} {en_passant} {self.halfmove_clock} {self.fullmove_number}"
 
 
     def print_board(self):
         """
         Prints the current position to terminal.
         """
-        for y, row in enumerate(self.board):
-            for x, col in enumerate(row):
-                # Print new line after 8th char
-                if x % 8 == 0:
-                    print()
-
-                # Print . for empty field
-                if self.board[y][x] == None:
-                    print(".", end=" ")    
-
-                # Print fen character for a taken field
-                else: 
-                    for key, value in self.fen_map.items():
-                        if self.board[y][x].fen_char == key:
-                            if self.board[y][x].color == ChessColor.WHITE:
-                                print(key.upper(), end=" ")
-                                break
-                            else:
-                                print(key.lower(), end=" ")
-                                break
\ No newline at end of file
+        for square, piece in enumerate(self.squares):
+            # Print new line after 8th char
+            if square % 8 == 0:
+                print()
+
+            # Print . for empty field
+            if piece is None:
+                print(".", end=" ")
+
+            # Print fen character for a taken field
+            else:
+                char = PIECE_CHARS[piece_kind(piece)]
+                print(char.upper() if piece_color(piece) == WHITE else char, end=" ")
@@ -0,0 +1,123 @@
+from bitboards import KING, WHITE, PIECE_CHARS
+
+"""
+This File holds the material values and piece-square tables of the evaluation.
+
+Position keeps a running material + piece-square total per color that move() / undo_move()
+update incrementally (like the Zobrist hash), so evaluation.evaluate_position does not have
+to visit every piece. compute_psqt_scores() is the slow full recomputation used for debugging.
+"""
+
+# defining the static value of a piece
+# since kings cannot be captured, they don't have values
+piece_values = {
+    "p" : 100.0,
+    'n' : 300.0,
+    'b' : 300.0,
+    'r' : 500.0,
+    'q' : 900.0
+}
+
+# the same values by piece kind, for the capture decisions of the search (static exchange evaluation,
+# quiescence). The king gets a value no exchange can make up for, so capturing with it into an attacked square never pays off
+kind_values = [int(piece_values[char]) for char in PIECE_CHARS[:5]] + [20_000]
+
+# position-square-tables - bonus scores for well positioned pieces, negative bonus for badly positioned pieces
+pst = {
+    "p" : [
+        [0,0,0,0,0,0,0,0],
+        [5,5,5,-5,-5,5,5,5],
+        [1,1,2,3,3,2,1,1],
+        [0.5,0.5,1,2.5,2.5,1,0.5,0.5],
+        [0,0,0,10,10,0,0,0],
+        [0.5,-0.5,-1,0,0,-1,-0.5,0.5],
+        [0.5,1,1,-2,-2,1,1,0.5],
+        [0,0,0,0,0,0,0,0]
+    ],
+
+    "n" : [
+        [-5,-4,-3,-3,-3,-3,-4,-5],
+        [-4,-2, 0, 0, 0, 0,-2,-4],
+        [-3, 0, 1, 1.5, 1.5, 1, 0,-3],
+        [-3, 0.5,1.5,2, 2, 1.5,0.5,-3],
+        [-3, 0, 1.5,2, 2, 1.5, 0,-3],
+        [-3, 0.5,1,1.5,1.5,1,0.5,-3],
+        [-4,-2, 0,0.5,0.5,0,-2,-4],
+        [-5,-4,-3,-3,-3,-3,-4,-5]
+    ],
+
+    "b" : [
+        [-2,-1,-1,-1,-1,-1,-1,-2],
+        [-1, 0, 0, 0, 0, 0, 0,-1],
+        [-1, 0, 0.5,1,1,0.5,0,-1],
+        [-1,0.5,0.5,1,1,0.5,0.5,-1],
+        [-1,0,1,1,1,1,0,-1],
+        [-1,1,1,1,1,1,1,-1],
+        [-1,0.5,0,0,0,0,0.5,-1],
+        [-2,-1,-1,-1,-1,-1,-1,-2]
+    ],
+
+    "r" : [
+        [0,0,0,0,0,0,0,0],
+        [0.5,1,1,1,1,1,1,0.5],
+        [-0.5,0,0,0,0,0,0,-0.5],
+        [-0.5,0,0,0,0,0,0,-0.5],
+        [-0.5,0,0,0,0,0,0,-0.5],
+        [-0.5,0,0,0,0,0,0,-0.5],
+        [-0.5,0,0,0,0,0,0,-0.5],
+        [0,0,0,0.5,0.5,0,0,0]
+    ],
+
+    "q" : [
+        [-2,-1,-1,-0.5,-0.5,-1,-1,-2],
+        [-1,0,0,0,0,0,0,-1],
+        [-1,0,0.5,0.5,0.5,0.5,0,-1],
+        [-0.5,0,0.5,0.5,0.5,0.5,0,-0.5],
+        [0,0,0.5,0.5,0.5,0.5,0, -0.5],
+        [-1,0.5,0.5,0.5,0.5,0.5,0,-1],
+        [-1,0,0.5,0,0,0,0,-1],
+        [-2,-1,-1,-0.5,-0.5,-1,-1,-2]
+    ],
+
+    "k" : [
+        [-3,-4,-4,-5,-5,-4,-4,-3],
+        [-3,-4,-4,-5,-5,-4,-4,-3],
+        [-3,-4,-4,-5,-5,-4,-4,-3],
+        [-3,-4,-4,-5,-5,-4,-4,-3],
+        [-2,-3,-3,-4,-4,-3,-3,-2],
+        [-1,-2,-2,-2,-2,-2,-2,-1],
+        [2,2,0,0,0,0,2,2],
+        [2,3,1,0,0,1,3,2]
+    ]
+}
+
+
+def _piece_square_values() -> list[list[float]]:
+    table = []
+    for piece in range(12):
+        kind, color = piece % 6, piece // 6
+        if kind == KING:
+            table.append([0.0] * 64) # kings have no value and their table is not used
+            continue
+        p_type = PIECE_CHARS[kind]
+        # the tables are written from white's side, black reads them mirrored
+        table.append([
+            piece_values[p_type] + (pst[p_type][y][x] if color == WHITE else pst[p_type][7 - y][x])
+            for y in range(8) for x in range(8)
+        ])
+    return table
+
+
+# piece_square_values[piece_code][square]: material + positional score of a piece on a square
+piece_square_values = _piece_square_values()
+
+
+def compute_psqt_scores(position) -> list[float]:
+    """
+    computes the material + piece-square totals of both colors (indexed by color value) from scratch
+    """
+    scores = [0.0, 0.0]
+    for square, piece in enumerate(position.squares):
+        if piece is not None:
+            scores[piece // 6] += piece_square_values[piece][square]
+    return scores
@@ -45,6 +45,36 @@ class Coordinate(NamedTuple):
     y: int
 
 
+class SearchInfo(NamedTuple):
+    """
+    report of one finished iteration of ChessBot.find_best_move (score in centipawns for the side to move)
+    """
+    depth: int
+    score: int
+    nodes: int
+    nps: int
+    pv: list[int] # packed moves, see moves.py
+    hashfull: int # permille of the transposition table in use
+    time: float # seconds since the start of the search
+
+
+class MoveStats(NamedTuple):
+    """
+    how often a move was played in a position, and the results of those games (see pgn.py)
+    """
+    move: int
+    games: int
+    white_wins: int
+    draws: int
+    black_wins: int
+
+
+class PgnGame(NamedTuple):
+    headers: dict[str, str]
+    moves: list[str] # SAN, without move numbers, comments, variations and annotations
+    result: str # '1-0', '0-1', '1/2-1/2' or '*'
+
+
 class ChessMove(BaseModel):
     origin: Coordinate
     target: Coordinate
@@ -57,10 +87,6 @@ class ChessMove(BaseModel):
     en_passant: bool = False
     double_move: bool = False
 
-    # keep track of latest position details, so the can undo its moves after looking through the search tree
-    prev_en_passant_square: Optional[Coordinate] = None
-    prev_castling_rights: Optional[dict[ChessColor, dict[str, bool]]] = None
-
     model_config = {"arbitrary_types_allowed": True} # allow custom data structures (in our example: Pawn, Bishop...)
 
 
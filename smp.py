@@ -0,0 +1,141 @@
+from position import Position
+from schemas import ChessColor, SearchInfo
+from bot import ChessBot
+from movegen import get_legal_moves
+from transposition import TranspositionTable
+from book import OpeningBook
+from typing import Callable
+import multiprocessing
+import queue
+import time
+import os
+
+"""
+Parallel search with Lazy SMP.
+https://www.chessprogramming.org/Lazy_SMP
+
+Every worker process runs a normal ChessBot search of the same root. The only thing the
+workers share is the transposition table, which lives in a shared memory block (threads
+would not help because of the GIL). The table needs no locks: entries are validated by
+their key, so racing writes can only lose an entry, never return a wrong one.
+
+The workers start their iterative deepening at different depths, so they are not all in
+the same iteration at the same time and fill the table for each other.
+"""
+
+
+def _search_worker(worker_id: int, position: Position, depth: int, time_limit: float | None, node_limit: int | None,
+                   hash_mb: int, shm_name: str, generation: int, options: dict, stop_event, results) -> None:
+    tt = TranspositionTable.attach(hash_mb, shm_name)
+    tt.generation = generation # find_best_move starts the same new search as in the main process
+    bot = ChessBot(tt=tt, **options)
+    bot.stop_event = stop_event
+
+    move = bot.find_best_move(position, depth, position.turn, time_limit, node_limit, start_depth=1 + worker_id % 3)
+    results.put((worker_id, move, bot.score, bot.pv, bot.completed_depth, bot.nodes))
+    tt.close()
+
+
+
+class ParallelChessBot():
+    """
+    Drop-in replacement for ChessBot.find_best_move that searches with several processes.
+    The shared table is kept between searches; call close() (or use a with block) to free it.
+    """
+
+    def __init__(self, workers: int | None = None, hash_mb: int = 64, book: OpeningBook | None = None, **options) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.book = book # consulted here, before any worker is started
+        self.hash_mb = hash_mb
+        self.options = options # passed on to every ChessBot (null_move, lmr, futility)
+        self.tt = TranspositionTable.create_shared(hash_mb)
+        self.stop_event = None # like ChessBot.stop_event, stops the workers once it is set (checked every 0.1 seconds)
+
+        # result of the last search, like ChessBot, plus the numbers of all workers together
+        self.score = 0
+        self.pv: list[int] = []
+        self.completed_depth = 0
+        self.nodes = 0
+        self.nps = 0
+
+
+    def __enter__(self) -> "ParallelChessBot":
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        self.tt.close()
+
+
+    def find_best_move(self, position: Position, depth: int, color: ChessColor, time_limit: float | None = None, node_limit: int | None = None,
+                       callback: Callable[[SearchInfo], None] | None = None) -> int | None:
+        """
+        searches like ChessBot.find_best_move, with self.workers processes. The search ends when
+        worker 0 is done; the others are stopped then. The move of the worker that finished the
+        deepest iteration is played (worker 0 on ties).
+
+        node_limit is split between the workers. The callback is only called once, with the final
+        result and the nodes of all workers.
+        """
+        if not get_legal_moves(position, color):
+            return None
+
+        if self.book is not None:
+            book_move = self.book.choose(position)
+            if book_move is not None:
+                self.score, self.pv, self.completed_depth, self.nodes, self.nps = 0, [book_move], 0, 0, 0
+                return book_move
+
+        generation = self.tt.generation
+        self.tt.new_search()
+        worker_nodes = max(1, node_limit // self.workers) if node_limit is not None else None
+
+        context = multiprocessing.get_context()
+        stop_event, results = context.Event(), context.Queue()
+        processes = [
+            context.Process(
+                target=_search_worker,
+                args=(i, position, depth, time_limit, worker_nodes, self.hash_mb, self.tt.shm_name, generation, self.options, stop_event, results),
+                daemon=True
+            )
+            for i in range(self.workers)
+        ]
+
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+
+        collected = {}
+        while len(collected) < self.workers:
+            try:
+                worker_id, *result = results.get(timeout=0.1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    break # a worker died without a result
+                if self.stop_event is not None and self.stop_event.is_set():
+                    stop_event.set()
+                continue
+            collected[worker_id] = result
+            if worker_id == 0:
+                stop_event.set()
+
+        stop_event.set()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        if not collected:
+            raise RuntimeError("No search process returned a result")
+
+        best = max(collected, key=lambda i: (collected[i][3], i == 0))
+        move, self.score, self.pv, self.completed_depth, _ = collected[best]
+        self.nodes = sum(result[4] for result in collected.values())
+        self.nps = int(self.nodes / elapsed) if elapsed > 0 else 0
+
+        if callback is not None:
+            callback(SearchInfo(self.completed_depth, self.score, self.nodes, self.nps, list(self.pv), self.tt.hashfull(), elapsed))
+        return move
@@ -0,0 +1,58 @@
+import unittest
+import tempfile
+import json
+import os
+from analyze import parse_epd, analyze_file
+
+POSITIONS = """7k/8/6K1/8/8/8/8/R7 w - - bm Ra8#; id "mate in one";
+r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3
+4k3/8/8/3q4/8/8/3R4/4K3 w - - bm Rxd5; id "hanging queen";
+not a position
+"""
+
+
+class AnalyzeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input = os.path.join(self.directory, "positions.epd")
+        self.output = os.path.join(self.directory, "results.jsonl")
+        with open(self.input, "w") as file:
+            file.write(POSITIONS)
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def results(self):
+        with open(self.output) as file:
+            return [json.loads(line) for line in file]
+
+    def test_parse_epd(self):
+        self.assertEqual(parse_epd('8/8/8/8/8/8/8/K6k w - - bm Kb1; id "x";'), ("8/8/8/8/8/8/8/K6k w - -", {"bm": "Kb1", "id": "x"}))
+        self.assertEqual(parse_epd("8/8/8/8/8/8/8/K6k b - - 12 40"), ("8/8/8/8/8/8/8/K6k b - - 12 40", {}))
+
+    def test_analyze_file(self):
+        self.assertEqual(analyze_file(self.input, self.output, depth=2, processes=2), 4)
+        results = self.results()
+        self.assertEqual([result["index"] for result in results], [0, 1, 2, 3])
+        self.assertEqual((results[0]["bestmove"], results[0]["mate"], results[0]["solved"]), ("a1a8", 1, True))
+        self.assertEqual(results[1]["fen"], "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        self.assertTrue(results[2]["solved"])
+        self.assertIn("error", results[3])
+
+    def test_resume(self):
+        analyze_file(self.input, self.output, depth=2, processes=1)
+        # a crash after the first result, in the middle of writing the second
+        with open(self.output) as file:
+            first = file.readline()
+        with open(self.output, "w") as file:
+            file.write(first + '{"index": 1, "fe')
+
+        self.assertEqual(analyze_file(self.input, self.output, depth=2, processes=2, ordered=False, resume=True), 3)
+        self.assertEqual(sorted(result["index"] for result in self.results()), [0, 1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,21 @@
+import unittest
+from position import Position
+from movegen import get_legal_moves
+from bench import bench_positions, run_bench
+
+
+class BenchTest(unittest.TestCase):
+
+    def test_positions_are_playable(self):
+        for fen in bench_positions:
+            pos = Position(fen)
+            self.assertTrue(get_legal_moves(pos, pos.turn), fen)
+
+    def test_signature_is_deterministic(self):
+        nodes, _ = run_bench(depth=2, hash_mb=1)
+        self.assertGreater(nodes, 0)
+        self.assertEqual(run_bench(depth=2, hash_mb=1)[0], nodes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import tempfile
+import os
+from position import Position
+from book import OpeningBook, polyglot_hash, decode_book_move, castling_move, ENTRY
+from bot import ChessBot
+from communication import uci_to_move
+from moves import move_to_uci
+
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def book_move(uci):
+    files = "abcdefgh"
+    return (files.index(uci[2]) | (int(uci[3]) - 1) << 3 | files.index(uci[0]) << 6 | (int(uci[1]) - 1) << 9)
+
+
+class OpeningBookTest(unittest.TestCase):
+
+    def setUp(self):
+        # a small book: two moves for the start position, one after 1.e4, and some other keys around them
+        entries = [
+            (0x463b96181691fc9c, book_move("e2e4"), 10),
+            (0x463b96181691fc9c, book_move("d2d4"), 30),
+            (0x823c9b50fd114196, book_move("c7c5"), 5),
+            (0x1, book_move("a2a3"), 1),
+            (0xFFFF_FFFF_FFFF_FFFF, book_move("h2h3"), 1),
+        ]
+        entries.sort()
+        handle, self.path = tempfile.mkstemp(suffix=".bin")
+        with os.fdopen(handle, "wb") as file:
+            for key, move, weight in entries:
+                file.write(ENTRY.pack(key, move, weight, 0))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_polyglot_hash(self):
+        # keys from the format description
+        pos = Position(START)
+        for uci, key in [("e2e4", 0x823c9b50fd114196), ("d7d5", 0x0756b94461c50fb0), ("e4e5", 0x662fafb965db29d4),
+                         ("f7f5", 0x22a48b5a8e47ff78), ("e1e2", 0x652a607ca3f242c1)]:
+            pos.move(uci_to_move(pos, uci))
+            self.assertEqual(polyglot_hash(pos), key)
+
+    def test_decode_castling(self):
+        self.assertEqual(decode_book_move(book_move("b7b8") | 4 << 12), "b7b8q")
+        pos = Position("r3k2r/8/8/8/8/8/8/R3K2R w Kq - 0 1")
+        self.assertEqual(castling_move(pos, decode_book_move(book_move("e1h1"))), "e1g1")
+        self.assertEqual(castling_move(pos, decode_book_move(book_move("e8a8"))), "e8c8")
+        # no right to castle long any more, or a rook moving along the back rank
+        self.assertEqual(castling_move(pos, "e1a1"), "e1a1")
+        self.assertEqual(castling_move(Position("4k3/8/8/8/8/8/8/4R1K1 w - - 0 1"), "e1a1"), "e1a1")
+
+    def test_book_rook_move(self):
+        pos = Position("4k3/8/8/8/8/8/8/4R1K1 w - - 0 1")
+        with open(self.path, "wb") as file:
+            file.write(ENTRY.pack(polyglot_hash(pos), book_move("e1a1"), 1, 0))
+        with OpeningBook(self.path) as book:
+            self.assertEqual(move_to_uci(book.choose(pos)), "e1a1")
+
+    def test_choose(self):
+        pos = Position(START)
+        with OpeningBook(self.path, selection="best") as book:
+            self.assertEqual(sorted(move_to_uci(m) for m, _ in book.moves(pos)), ["d2d4", "e2e4"])
+            self.assertEqual(move_to_uci(book.choose(pos)), "d2d4")
+            pos.move(uci_to_move(pos, "e2e4"))
+            self.assertEqual(move_to_uci(book.choose(pos)), "c7c5")
+            pos.move(uci_to_move(pos, "c7c5"))
+            self.assertIsNone(book.choose(pos))
+
+        with OpeningBook(self.path, seed=1) as book:
+            chosen = {move_to_uci(book.choose(Position(START))) for _ in range(50)}
+            self.assertEqual(chosen, {"d2d4", "e2e4"})
+
+    def test_bot_plays_book_moves(self):
+        pos = Position(START)
+        with OpeningBook(self.path, selection="best") as book:
+            bot = ChessBot(hash_mb=1, book=book)
+            self.assertEqual(move_to_uci(bot.find_best_move(pos, 4, pos.turn)), "d2d4")
+            self.assertEqual(bot.nodes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import unittest
+import io
+import contextlib
+import time
+from position import Position
+from bot import ChessBot, MAX_DEPTH, INFINITY, mate_in
+from movegen import generate_moves, get_legal_moves, get_pseudo_legal_moves, get_legal_captures, get_legal_quiets
+from movegen import get_check_info, is_legal_move
+from moves import move_origin, move_target, encode_move, CAPTURE
+from schemas import ChessColor
+
+
+class ChessBotTest(unittest.TestCase):
+
+    def search(self, bot, pos, depth, **limits):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return bot.find_best_move(pos, depth, pos.turn, **limits)
+
+    def test_node_limit_returns_legal_move(self):
+        pos = Position("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        start_hash = pos.hash
+        bot = ChessBot(hash_mb=1)
+        move = self.search(bot, pos, MAX_DEPTH, node_limit=30)
+
+        self.assertLessEqual(bot.nodes, 30)
+        self.assertEqual(pos.hash, start_hash)
+        self.assertIn(move, generate_moves(pos, pos.turn))
+
+    def test_time_limit(self):
+        pos = Position("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR")
+        bot = ChessBot(hash_mb=1)
+        start = time.perf_counter()
+        move = self.search(bot, pos, MAX_DEPTH, time_limit=0.5)
+        self.assertIsNotNone(move)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_captures_hanging_queen(self):
+        pos = Position("4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1")
+        move = self.search(ChessBot(hash_mb=1), pos, 2)
+        self.assertEqual((move_origin(move), move_target(move)), (51, 27)) # d2xd5
+
+    def test_stats_and_callback(self):
+        pos = Position("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        bot = ChessBot(hash_mb=1)
+        infos = []
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            move = bot.find_best_move(pos, 4, pos.turn, callback=infos.append)
+
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual([info.depth for info in infos], [1, 2, 3, 4])
+        self.assertEqual(infos[-1].nodes, bot.stats.nodes)
+        self.assertEqual(infos[-1].pv[0], move)
+        self.assertEqual(len(bot.stats.depth_times), 4)
+        self.assertGreater(bot.stats.cutoffs, 0)
+        self.assertLessEqual(bot.stats.first_move_cutoffs, bot.stats.cutoffs)
+
+    def test_stopped_search_keeps_pv(self):
+        # stopped in the middle of an iteration, the returned move may come from that iteration
+        for nodes in (14500, 17300):
+            pos = Position("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+            bot = ChessBot(hash_mb=1)
+            move = bot.find_best_move(pos, 64, pos.turn, node_limit=nodes)
+            self.assertEqual(bot.pv[0], move)
+
+    def test_pondering(self):
+        pos = Position("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        bot = ChessBot(hash_mb=1)
+        pos.move(bot.find_best_move(pos, 3, pos.turn))
+        start_hash = pos.hash
+
+        # hit: the ponder search goes on and answers the expected reply
+        expected = bot.start_pondering(pos)
+        self.assertIn(expected, generate_moves(pos, pos.turn))
+        time.sleep(0.2)
+        self.assertEqual(pos.hash, start_hash)
+        pos.move(expected)
+        move = bot.ponder_hit(0.2)
+        self.assertIn(move, generate_moves(pos, pos.turn))
+        self.assertEqual(bot.ponder_move, 0)
+
+        # no expected reply if the last principal variation doesn't start with the move that was played
+        other = next(reply for reply in generate_moves(pos, pos.turn) if reply != bot.pv[0])
+        pos.move(other)
+        self.assertIsNone(bot.start_pondering(pos))
+        pos.undo_move(other)
+
+        # miss: the ponder search is stopped right away
+        pos.move(move)
+        self.assertIsNotNone(bot.start_pondering(pos))
+        start = time.perf_counter()
+        bot.ponder_miss()
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertIsNone(bot.ponder_thread)
+
+    def test_quiescence_sees_recapture(self):
+        # Qxd5 wins a pawn at depth 1, but exd5 takes the queen back
+        pos = Position("4k3/8/4p3/3p4/8/8/8/3QK3 w - - 0 1")
+        bot = ChessBot(hash_mb=1)
+        move = self.search(bot, pos, 1)
+        self.assertNotEqual((move_origin(move), move_target(move)), (59, 27))
+        self.assertGreater(bot.qnodes, 0)
+
+    def test_finds_mate(self):
+        pos = Position("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        bot = ChessBot(hash_mb=1)
+        move = self.search(bot, pos, 3)
+        self.assertEqual((move_origin(move), move_target(move)), (56, 0)) # Ra8#
+        self.assertEqual(mate_in(bot.score), 1)
+
+        # mate in 2 with two rooks, the principal variation ends in mate
+        pos = Position("7k/8/8/8/8/8/R7/1R4K1 w - - 0 1")
+        move = self.search(bot, pos, 4)
+        self.assertEqual(mate_in(bot.score), 2)
+        self.assertEqual(bot.pv[0], move)
+        self.assertEqual(len(bot.pv), 3)
+
+    def test_selective_search_options(self):
+        pos = Position("7k/8/8/8/8/8/R7/1R4K1 w - - 0 1")
+        for options in ({}, {"null_move": False}, {"lmr": False}, {"futility": False}):
+            bot = ChessBot(hash_mb=1, **options)
+            self.search(bot, pos, 4)
+            self.assertEqual(mate_in(bot.score), 2, options)
+
+    def test_stalemate_is_a_draw(self):
+        pos = Position("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+        bot = ChessBot(hash_mb=1)
+        self.assertIsNone(self.search(bot, pos, 2))
+        self.assertEqual(bot.negamax(pos, 2, -INFINITY, INFINITY), 0) # despite the material
+
+    def test_move_ordering(self):
+        pos = Position("4k3/8/8/3q4/8/2n5/1B1R4/4K3 w - - 0 1")
+        bot = ChessBot(hash_mb=1)
+        hash_move = encode_move(51, 35) # d2d4
+        killer = encode_move(60, 61) # e1f1
+        bot.killers[0][0] = killer
+        moves = bot.order_moves(pos, generate_moves(pos, pos.turn), hash_move, 0, pos.turn.value)
+
+        self.assertEqual(moves[0], hash_move)
+        self.assertEqual(moves[1:3], [encode_move(51, 27, CAPTURE), encode_move(49, 42, CAPTURE)]) # queen before knight
+        self.assertEqual(moves[3], killer)
+
+    def test_staged_move_picker(self):
+        # Qxd5 loses the queen to exd5, Bxc3 wins a knight
+        pos = Position("4k3/8/4p3/3p4/8/2n5/1B6/3QK3 w - - 0 1")
+        bot = ChessBot(hash_mb=1)
+        hash_move = encode_move(60, 53) # e1f2
+        killer = encode_move(59, 51) # d1d2
+        bot.killers[0][0] = killer
+        moves = list(bot.pick_moves(pos, pos.turn, hash_move, 0))
+
+        self.assertEqual(sorted(moves), sorted(generate_moves(pos, pos.turn)))
+        self.assertEqual(moves[:3], [hash_move, encode_move(49, 42, CAPTURE), killer])
+        self.assertEqual(moves[-1], encode_move(59, 27, CAPTURE))
+
+        # moves that are not legal here are never picked
+        illegal = encode_move(60, 44) # e1e3
+        self.assertNotIn(illegal, bot.pick_moves(pos, pos.turn, illegal, 0))
+
+    def test_stages_share_check_info(self):
+        # pins, checks, en passant and castling, generated in parts with one check_info
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                    "8/8/8/2k5/3Pp3/8/8/4K2R b K d3 0 1"]:
+            pos = Position(fen)
+            legal = get_legal_moves(pos, pos.turn)
+            check_info = get_check_info(pos, pos.turn)
+            self.assertEqual(sorted(get_legal_captures(pos, pos.turn, check_info) + get_legal_quiets(pos, pos.turn, check_info)),
+                             sorted(legal))
+            for move in get_pseudo_legal_moves(pos, pos.turn) + get_pseudo_legal_moves(pos, ChessColor(pos.turn.value ^ 1)):
+                self.assertEqual(is_legal_move(pos, pos.turn, move, check_info), move in legal)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import io
+from communication import Communicator, time_for_move, uci_to_move
+from position import Position
+from moves import move_to_uci
+from movegen import get_legal_moves
+
+
+class CommunicatorTest(unittest.TestCase):
+
+    def run_commands(self, *commands):
+        output = io.StringIO()
+        Communicator(io.StringIO("\n".join(commands) + "\n"), output).loop()
+        return output.getvalue().splitlines()
+
+    def test_handshake(self):
+        lines = self.run_commands("uci", "isready", "quit")
+        self.assertEqual(lines[-2:], ["uciok", "readyok"])
+
+    def test_go_depth(self):
+        lines = self.run_commands("position fen 7k/8/6K1/8/8/8/8/R7 w - - 0 1", "go depth 3")
+        self.assertTrue(lines[0].startswith("info depth 1 score mate 1"))
+        self.assertEqual(lines[-1], "bestmove a1a8")
+
+    def test_infinite_waits_for_stop(self):
+        lines = self.run_commands("position startpos moves e2e4 e7e5 g1f3", "go infinite", "stop", "quit")
+        self.assertEqual(len([line for line in lines if line.startswith("bestmove")]), 1)
+        pos = Position("rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2")
+        self.assertIn(lines[-1].split()[1], [move_to_uci(m) for m in get_legal_moves(pos, pos.turn)])
+
+    def test_invalid_commands(self):
+        # the engine answers with an info string and keeps the last position
+        lines = self.run_commands("position fen 7k/8/6K1/8/8/8/8/R7 w - - 0 1", "position startpos moves e2e5",
+                                  "setoption name Hash value big", "go depth x", "isready", "go depth 3")
+        self.assertEqual(lines[:4], ["info string Illegal move: e2e5",
+                                     "info string invalid literal for int() with base 10: 'big'",
+                                     "info string invalid literal for int() with base 10: 'x'", "readyok"])
+        self.assertEqual(lines[-1], "bestmove a1a8")
+
+    def test_uci_to_move(self):
+        pos = Position("r3k2r/8/8/8/8/8/1p6/R3K2R b KQkq - 0 1")
+        self.assertEqual(move_to_uci(uci_to_move(pos, "e8c8")), "e8c8")
+        self.assertEqual(move_to_uci(uci_to_move(pos, "b2a1n")), "b2a1n")
+        with self.assertRaises(ValueError):
+            uci_to_move(pos, "e8e6")
+
+    def test_time_for_move(self):
+        self.assertAlmostEqual(time_for_move(60, 0), 2.0)
+        self.assertAlmostEqual(time_for_move(10, 1, moves_to_go=5), 2.75)
+        self.assertLess(time_for_move(0.1, 5), 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from position import Position
+from movegen import get_pseudo_legal_moves, get_legal_moves, filter_legal_moves, see
+from moves import encode_move, move_origin, move_target, move_promotion, to_chess_move, from_chess_move
+from moves import CAPTURE, EN_PASSANT
+from bitboards import QUEEN
+from schemas import ChessCastling, PromotionPiece
+
+
+class MovesTest(unittest.TestCase):
+
+    def test_encoding(self):
+        move = encode_move(12, 4, CAPTURE, QUEEN)
+        self.assertEqual(move_origin(move), 12)
+        self.assertEqual(move_target(move), 4)
+        self.assertEqual(move_promotion(move), QUEEN)
+        self.assertTrue(move & CAPTURE)
+
+    def test_chess_move_round_trip(self):
+        pos = Position("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        for move in get_pseudo_legal_moves(pos, pos.turn):
+            self.assertEqual(from_chess_move(to_chess_move(move, pos.turn), pos), move)
+
+    def test_special_moves(self):
+        pos = Position("r3k3/1P6/8/3pP3/8/8/8/4K2R w Kq d6 0 1")
+        chess_moves = [to_chess_move(m, pos.turn) for m in get_pseudo_legal_moves(pos, pos.turn)]
+        self.assertTrue(any(m.castling == ChessCastling.KINGSIDE for m in chess_moves))
+        self.assertTrue(any(m.en_passant for m in chess_moves))
+        self.assertEqual(sum(m.promotion == PromotionPiece.QUEEN for m in chess_moves), 2) # b8=Q and bxa8=Q
+
+
+class LegalMovegenTest(unittest.TestCase):
+
+    def perft(self, pos, depth):
+        if depth == 0:
+            return 1
+        total = 0
+        for move in get_legal_moves(pos, pos.turn):
+            pos.move(move)
+            total += self.perft(pos, depth - 1)
+            pos.undo_move(move)
+        return total
+
+    def test_perft(self):
+        # https://www.chessprogramming.org/Perft_Results
+        cases = [
+            ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 2, 2039),
+            ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 3, 2812),
+            ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3, 9467),
+            ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 2, 1486),
+        ]
+        for fen, depth, nodes in cases:
+            self.assertEqual(self.perft(Position(fen), depth), nodes, fen)
+
+    def test_matches_filtered_pseudo_legal_moves(self):
+        pos = Position("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        for move in get_legal_moves(pos, pos.turn):
+            pos.move(move)
+            expected = filter_legal_moves(pos, pos.turn, get_pseudo_legal_moves(pos, pos.turn))
+            self.assertEqual(sorted(get_legal_moves(pos, pos.turn)), sorted(expected))
+            pos.undo_move(move)
+
+    def test_en_passant_discovered_check(self):
+        # bxc6 would take both pawns off the fifth rank and expose the king to the rook
+        pos = Position("8/8/8/KPp4r/8/8/8/7k w - c6 0 1")
+        self.assertFalse(any(m & EN_PASSANT for m in get_legal_moves(pos, pos.turn)))
+
+    def test_double_check_only_king_moves(self):
+        pos = Position("4k3/8/8/8/8/5n2/8/R3K2r w Q - 0 1")
+        self.assertTrue(all(move_origin(m) == 60 for m in get_legal_moves(pos, pos.turn)))
+
+    def test_see(self):
+        cases = [
+            ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", encode_move(60, 28, CAPTURE), 100), # Rxe5, undefended
+            ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", encode_move(43, 28, CAPTURE), -200), # Nxe5, x-rays on both sides
+            ("4k3/4r3/8/4p3/8/8/4R3/4R2K w - - 0 1", encode_move(52, 28, CAPTURE), 100), # doubled rooks win the pawn
+            ("4k3/8/4p3/3p4/8/8/8/3QK3 w - - 0 1", encode_move(59, 27, CAPTURE), -800), # Qxd5 exd5
+        ]
+        for fen, move, expected in cases:
+            self.assertEqual(see(Position(fen), move), expected, fen)
+
+
+if __name__ == '__main__':
+    unittest.main()
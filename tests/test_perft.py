@@ -0,0 +1,42 @@
+import unittest
+from position import Position
+from perft import perft, perft_divide, PerftCache
+from perft_suite import run_perft, find_problems
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+
+class PerftTest(unittest.TestCase):
+
+    def test_perft(self):
+        pos = Position(KIWIPETE)
+        start_hash = pos.hash
+        self.assertEqual([perft(pos, d) for d in range(4)], [1, 48, 2039, 97862])
+        self.assertEqual(pos.hash, start_hash)
+
+    def test_cache(self):
+        pos = Position("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+        cache = PerftCache(1)
+        self.assertEqual(perft(pos, 4, cache), 197281)
+        self.assertEqual(perft(pos, 4, cache), 197281)
+        self.assertEqual(cache.hits, 1) # the whole tree is cached now
+
+    def test_divide(self):
+        pos = Position(KIWIPETE)
+        counts = perft_divide(pos, 2)
+        self.assertEqual(len(counts), 48)
+        self.assertEqual(sum(counts.values()), 2039)
+        self.assertEqual(perft_divide(pos, 3, processes=2, cache_mb=1), perft_divide(pos, 3))
+
+    def test_suite(self):
+        results = run_perft(max_nodes=10_000)
+        self.assertEqual(len(results), 6)
+        self.assertEqual(find_problems({"perft": results}, None), [])
+
+        entry = {"perft": [], "generate_moves_per_second": 700, "move_undo_per_second": 1000}
+        previous = {"perft": [], "generate_moves_per_second": 1000, "move_undo_per_second": 1000}
+        self.assertEqual(len(find_problems(entry, previous, tolerance=0.2)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
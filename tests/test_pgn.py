@@ -0,0 +1,88 @@
+import unittest
+import tempfile
+import io
+import os
+from position import Position, START_FEN
+from pgn import read_games, san_to_move, build_index, PositionIndex
+from moves import move_to_uci
+
+PGN = """[Event "One"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 {a comment
+over two lines} Nc6 (2... d6 3. d4) 3. Bb5 a6 $1 4. Ba4 Nf6 5. O-O! Be7 1-0
+
+[Event "Two"]
+[Result "1/2-1/2"]
+
+1.e4 e5 2.Nf3 Nf6 3.Nxe5 d6 1/2-1/2
+
+[Event "Three"]
+[Result "0-1"]
+
+1. d4 d5 2. c4 dxc4 0-1
+"""
+
+
+class PgnTest(unittest.TestCase):
+
+    def test_read_games(self):
+        games = list(read_games(io.StringIO(PGN)))
+        self.assertEqual([game.headers["Event"] for game in games], ["One", "Two", "Three"])
+        self.assertEqual(games[0].moves, ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6", "Ba4", "Nf6", "O-O", "Be7"])
+        self.assertEqual(games[1].result, "1/2-1/2")
+
+    def test_tag_lines_in_comments(self):
+        # wrapped exports break comments right before '[%clk ...]'
+        pgn = """[Event "Clock"]
+[Result "0-1"]
+
+1. e4 {
+[%clk 0:03:00] } e5 { ; [ not a tag
+[%clk 0:02:59]} 2. Qh5 ; {
+Nc6 0-1
+
+[Event "Next"]
+[Result "*"]
+
+1. d4 *
+"""
+        games = list(read_games(io.StringIO(pgn)))
+        self.assertEqual([game.headers["Event"] for game in games], ["Clock", "Next"])
+        self.assertEqual(games[0].moves, ["e4", "e5", "Qh5", "Nc6"])
+
+    def test_san_to_move(self):
+        pos = Position("r3k2r/1P1n4/8/8/8/8/3N4/R3K1NR w KQkq - 0 1")
+        self.assertEqual(move_to_uci(san_to_move(pos, "O-O-O")), "e1c1")
+        self.assertEqual(move_to_uci(san_to_move(pos, "bxa8=Q+")), "b7a8q")
+        self.assertEqual(move_to_uci(san_to_move(pos, "b8N")), "b7b8n")
+        self.assertEqual(move_to_uci(san_to_move(pos, "Ne2")), "g1e2") # the d2 knight can't reach e2
+        with self.assertRaises(ValueError):
+            san_to_move(pos, "Nf3") # both knights can
+        self.assertEqual(move_to_uci(san_to_move(pos, "Ngf3")), "g1f3")
+        with self.assertRaises(ValueError):
+            san_to_move(pos, "Qd4")
+
+    def test_index(self):
+        directory = tempfile.mkdtemp()
+        pgn_path, index_path = os.path.join(directory, "games.pgn"), os.path.join(directory, "games.idx")
+        with open(pgn_path, "w") as file:
+            file.write(PGN)
+
+        self.assertEqual(build_index([pgn_path], index_path, processes=2, batch_games=1), (3, 0))
+        with PositionIndex(index_path) as index:
+            stats = index.lookup(Position(START_FEN))
+            self.assertEqual([(move_to_uci(s.move), s.games, s.white_wins, s.draws, s.black_wins) for s in stats],
+                             [("e2e4", 2, 1, 1, 0), ("d2d4", 1, 0, 0, 1)])
+            # set up from a FEN: no en passant square, still found
+            stats = index.lookup(Position("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"))
+            self.assertEqual([(move_to_uci(s.move), s.games) for s in stats], [("g1f3", 2)])
+            self.assertEqual(index.lookup(Position("8/8/8/8/8/8/8/K6k w - - 0 1")), [])
+
+        os.remove(pgn_path)
+        os.remove(index_path)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
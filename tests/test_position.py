@@ -0,0 +1,174 @@
+import unittest
+from position import Position
+from movegen import generate_moves
+from schemas import ChessColor
+from bitboards import PAWN, KING, WHITE, BLACK, make_piece, rook_attacks, bishop_attacks
+from utils import long_algebraic_to_move
+from zobrist import compute_hash
+from moves import from_chess_move, square_name
+from position import WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE, ALL_CASTLING_RIGHTS
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR"
+
+square_of = {square_name(square): square for square in range(64)}
+
+
+def bitboard(*names):
+    return sum(1 << square_of[name] for name in names)
+
+
+class PositionTest(unittest.TestCase):
+
+    def assert_bitboards_match_squares(self, pos):
+        for piece, bb in enumerate(pos.bitboards):
+            expected = sum(1 << sq for sq, p in enumerate(pos.squares) if p == piece)
+            self.assertEqual(bb, expected)
+        self.assertEqual(pos.occupancy[WHITE] | pos.occupancy[BLACK], pos.occupied)
+        self.assertEqual(pos.occupancy[WHITE] & pos.occupancy[BLACK], 0)
+
+    def test_position_to_fen(self):
+        for fen in ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                    "8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 40"]:
+            self.assertEqual(Position(fen).position_to_fen(), fen)
+
+    def test_fen_missing_fields(self):
+        # loading a position again doesn't keep anything of the old one
+        pos = Position("8/8/8/2k5/3Pp3/8/8/4K3 b - d3 7 40")
+        pos.fen_to_position("4k3/8/8/8/8/8/8/4K3")
+        self.assertEqual(pos.position_to_fen(), "4k3/8/8/8/8/8/8/4K3 w KQkq - 0 1")
+        self.assertEqual(pos.hash, compute_hash(pos))
+        # five fields: the halfmove clock is there, the fullmove number isn't
+        self.assertEqual(Position("4k3/8/8/8/8/8/8/4K3 b - - 12").position_to_fen(), "4k3/8/8/8/8/8/8/4K3 b - - 12 1")
+
+    def test_fen_to_bitboards(self):
+        pos = Position(START_FEN)
+        self.assertEqual(pos.bitboards[make_piece(PAWN, WHITE)], 0xFF << 48)
+        self.assertEqual(pos.bitboards[make_piece(PAWN, BLACK)], 0xFF << 8)
+        self.assertEqual(pos.bitboards[make_piece(KING, WHITE)], 1 << 60)
+        self.assertEqual(pos.occupied, (0xFFFF << 48) | 0xFFFF)
+        self.assert_bitboards_match_squares(pos)
+
+    def test_slider_attacks(self):
+        # empty board: whole rays, the own square isn't attacked
+        self.assertEqual(rook_attacks(square_of["d4"], 0).bit_count(), 14)
+        self.assertEqual(bishop_attacks(square_of["a8"], 0), bitboard("b7", "c6", "d5", "e4", "f3", "g2", "h1"))
+        # a ray ends at the first blocker, which is attacked itself
+        self.assertEqual(rook_attacks(square_of["d4"], bitboard("d6", "f4", "d7", "g4")),
+                         bitboard("d5", "d6", "d3", "d2", "d1", "c4", "b4", "a4", "e4", "f4"))
+        self.assertEqual(bishop_attacks(square_of["c1"], bitboard("e3", "f4", "b2")), bitboard("b2", "d2", "e3"))
+
+    def test_is_square_attacked(self):
+        pos = Position("4k3/8/8/8/4P3/5n2/8/4K3 w - - 0 1")
+        # pawns attack diagonally forward only
+        self.assertTrue(pos.is_square_attacked(square_of["d5"], WHITE))
+        self.assertFalse(pos.is_square_attacked(square_of["e5"], WHITE))
+        self.assertFalse(pos.is_square_attacked(square_of["d3"], WHITE))
+        # knight, also on taken squares
+        self.assertTrue(pos.is_square_attacked(square_of["e1"], BLACK))
+        self.assertTrue(pos.is_square_attacked(square_of["e5"], BLACK))
+        self.assertFalse(pos.is_square_attacked(square_of["f2"], BLACK))
+        # kings
+        self.assertTrue(pos.is_square_attacked(square_of["d7"], BLACK))
+        self.assertFalse(pos.is_square_attacked(square_of["e6"], BLACK))
+
+    def test_in_check(self):
+        for fen, checked in [("4k3/4r3/8/8/8/8/8/4K3 w - - 0 1", True),   # rook along the file
+                             ("4k3/4r3/8/8/8/8/4P3/4K3 w - - 0 1", False), # ... blocked
+                             ("4k3/8/8/b7/8/8/8/4K3 w - - 0 1", True),     # bishop along the diagonal
+                             ("4k3/8/8/b7/8/8/3P4/4K3 w - - 0 1", False),  # ... blocked
+                             ("4k3/8/8/8/8/5n2/8/4K3 w - - 0 1", True),    # knight
+                             ("4k3/8/8/8/8/8/5p2/4K3 w - - 0 1", True),    # pawn
+                             ("4k3/8/8/8/8/8/4p3/4K3 w - - 0 1", False)]:  # a pawn in front doesn't check
+            pos = Position(fen)
+            self.assertEqual(pos.in_check(WHITE), checked, fen)
+            self.assertFalse(pos.in_check(BLACK), fen)
+
+    def test_move_and_undo_keep_bitboards_in_sync(self):
+        pos = Position(START_FEN)
+        before = list(pos.bitboards)
+        for move in generate_moves(pos, ChessColor.WHITE):
+            pos.move(move)
+            self.assert_bitboards_match_squares(pos)
+            for reply in generate_moves(pos, ChessColor.BLACK):
+                pos.move(reply)
+                self.assert_bitboards_match_squares(pos)
+                pos.undo_move(reply)
+            pos.undo_move(move)
+        self.assertEqual(pos.bitboards, before)
+
+    def play(self, pos, *moves):
+        played = []
+        for notation in moves:
+            played.append(from_chess_move(long_algebraic_to_move(notation, pos.turn), pos))
+            pos.move(played[-1])
+        return played
+
+    def test_transpositions_share_hash(self):
+        first, second = Position(START_FEN), Position(START_FEN)
+        self.play(first, "g1-f3", "g8-f6", "b1-c3")
+        self.play(second, "b1-c3", "g8-f6", "g1-f3")
+        self.assertEqual(first.hash, second.hash)
+        self.assertEqual(first.hash, compute_hash(first))
+
+        # same pieces, different side to move
+        self.play(second, "f6-g8", "f3-g1", "g8-f6")
+        self.assertNotEqual(first.hash, second.hash)
+
+    def test_hash_debug_mode(self):
+        pos = Position("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", debug_hash=True)
+        start_hash = pos.hash
+        for move in generate_moves(pos, pos.turn):
+            pos.move(move)
+            for reply in generate_moves(pos, pos.turn):
+                pos.move(reply)
+                pos.undo_move(reply)
+            pos.undo_move(move)
+        self.assertEqual(pos.hash, start_hash)
+
+        pos.hash ^= 1
+        with self.assertRaises(RuntimeError):
+            pos.verify_hash()
+
+    def test_psqt_scores_stay_in_sync(self):
+        # promotions, castling, en passant and captures; debug mode recomputes the scores after every move
+        for fen in ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                    "r3k2r/8/8/3pP3/8/8/8/R3K2R w KQkq d6 0 1"):
+            pos = Position(fen, debug_hash=True)
+            start_scores = list(pos.psqt_scores)
+            for move in generate_moves(pos, pos.turn):
+                pos.move(move)
+                for reply in generate_moves(pos, pos.turn):
+                    pos.move(reply)
+                    pos.undo_move(reply)
+                pos.undo_move(move)
+            self.assertEqual(pos.psqt_scores, start_scores)
+
+    def test_null_move(self):
+        pos = Position("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+        start_hash = pos.hash
+        pos.move_null()
+        self.assertEqual((pos.turn, pos.en_passant_square, pos.ply), (ChessColor.BLACK, None, 1))
+        self.assertEqual(pos.hash, compute_hash(pos))
+        pos.undo_null_move()
+        self.assertEqual((pos.turn, pos.en_passant_square, pos.hash), (ChessColor.WHITE, 19, start_hash))
+
+    def test_state_stack_restores_rights_and_clocks(self):
+        pos = Position("r3k2r/8/8/8/8/8/6p1/R3K2R b KQkq - 3 20")
+        first, = self.play(pos, "g2-h1=Q") # captures the rook on h1
+        self.assertEqual(pos.castling_rights, WHITE_QUEENSIDE | BLACK_KINGSIDE | BLACK_QUEENSIDE)
+        self.assertEqual((pos.halfmove_clock, pos.fullmove_number), (0, 21))
+        second, = self.play(pos, "a1-b1")
+        self.assertEqual(pos.castling_rights, BLACK_KINGSIDE | BLACK_QUEENSIDE)
+        self.assertEqual(pos.halfmove_clock, 1)
+
+        pos.undo_move(second)
+        pos.undo_move(first)
+        self.assertEqual(pos.castling_rights, ALL_CASTLING_RIGHTS)
+        self.assertEqual((pos.halfmove_clock, pos.fullmove_number, pos.ply), (3, 20, 0))
+        self.assertEqual(pos.hash, compute_hash(pos))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+import io
+import contextlib
+from position import Position
+from smp import ParallelChessBot
+from bot import MAX_DEPTH
+from movegen import generate_moves
+
+
+class ParallelChessBotTest(unittest.TestCase):
+
+    def test_two_workers(self):
+        pos = Position("r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+        with ParallelChessBot(workers=2, hash_mb=1) as bot, contextlib.redirect_stdout(io.StringIO()):
+            move = bot.find_best_move(pos, MAX_DEPTH, pos.turn, time_limit=0.5)
+
+        self.assertIn(move, generate_moves(pos, pos.turn))
+        self.assertGreaterEqual(bot.completed_depth, 1)
+        self.assertEqual(bot.pv[0], move)
+        self.assertGreater(bot.nodes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
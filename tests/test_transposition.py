@@ -0,0 +1,59 @@
+import unittest
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def test_store_and_probe(self):
+        tt = TranspositionTable(1)
+        key = 0x1234_5678_9ABC_DEF0
+        self.assertIsNone(tt.probe(key))
+
+        tt.store(key, 4, LOWER, -250, 0x1F3)
+        self.assertEqual(tt.probe(key), (4, LOWER, -250, 0x1F3))
+        self.assertEqual(tt.hits, 1)
+        self.assertEqual(tt.probes, 2)
+        self.assertEqual(tt.hit_rate(), 0.5)
+
+    def test_depth_preferred_and_always_replace(self):
+        tt = TranspositionTable(1)
+        stride = tt.bucket_mask + 1 # keys that share a bucket
+        deep, shallow, newer = 5, 5 + stride, 5 + 2 * stride
+
+        tt.store(deep, 6, EXACT, 10, 1)
+        tt.store(shallow, 2, UPPER, 20, 2)
+        self.assertIsNotNone(tt.probe(deep))
+        self.assertIsNotNone(tt.probe(shallow))
+
+        # the shallow entry is replaced, the deep one survives
+        tt.store(newer, 1, EXACT, 30, 3)
+        self.assertIsNotNone(tt.probe(deep))
+        self.assertIsNone(tt.probe(shallow))
+
+        # after a new search the deep entry is aged and can be replaced
+        tt.new_search()
+        tt.store(shallow, 1, EXACT, 40, 4)
+        self.assertIsNone(tt.probe(deep))
+        self.assertEqual(tt.probe(shallow), (1, EXACT, 40, 4))
+
+    def test_keeps_known_move(self):
+        tt = TranspositionTable(1)
+        tt.store(99, 3, EXACT, 0, 0x2A)
+        tt.store(99, 4, UPPER, -5, 0)
+        self.assertEqual(tt.probe(99), (4, UPPER, -5, 0x2A))
+
+    def test_shared_memory(self):
+        tt = TranspositionTable.create_shared(1)
+        other = TranspositionTable.attach(1, tt.shm_name)
+        try:
+            tt.store(77, 5, LOWER, 123, 0x3C)
+            self.assertEqual(other.probe(77), (5, LOWER, 123, 0x3C))
+            other.clear()
+            self.assertIsNone(tt.probe(77))
+        finally:
+            other.close()
+            tt.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
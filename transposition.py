@@ -0,0 +1,214 @@
+from array import array
+from multiprocessing import shared_memory
+
+"""
+This File implements the transposition table of the search.
+https://www.chessprogramming.org/Transposition_Table
+
+The table is a flat array of unsigned 64 bit words, no python objects are stored per entry.
+Every entry takes two words: the packed data and the Zobrist key XORed with that data.
+A slot only counts as a hit if both words belong together, so a torn or foreign write
+simply looks like a miss.
+
+Entries are grouped into buckets of two slots:
+    slot 0 - depth preferred: only replaced by deeper searches, or if the entry is from an older search
+    slot 1 - always replace: takes everything slot 0 did not accept
+
+The words can also live in a multiprocessing.shared_memory block (see create_shared / attach),
+so several search processes share one table without any locking (see smp.py).
+"""
+
+
+# bound types
+EXACT, LOWER, UPPER = 1, 2, 3
+
+# layout of the data word
+MOVE_BITS = 24
+DEPTH_SHIFT = 24
+BOUND_SHIFT = 32
+GENERATION_SHIFT = 34
+SCORE_SHIFT = 40
+SCORE_OFFSET = 1 << 23 # scores are stored unsigned in 24 bits
+
+MOVE_MASK = (1 << MOVE_BITS) - 1
+GENERATION_MASK = 0x3F
+
+ENTRY_WORDS = 2
+BUCKET_SLOTS = 2
+ENTRY_BYTES = ENTRY_WORDS * 8
+
+
+class TranspositionTable():
+    """
+    Fixed size hash table storing search results by Zobrist key.
+    The size is given in megabytes and rounded down to a power of two number of buckets.
+    """
+
+    def __init__(self, size_mb: int = 16, shm_name: str | None = None, create: bool = False) -> None:
+        """
+        shm_name: keep the table in the shared memory block of that name instead of a private array.
+                  The block is created (and owned) if create is set, otherwise attached to
+        """
+        buckets = max(1, (size_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SLOTS))
+        buckets = 1 << (buckets.bit_length() - 1) # power of two, so a mask can be used as index
+        self.bucket_mask = buckets - 1
+        self.size_mb = size_mb
+        size = buckets * BUCKET_SLOTS * ENTRY_BYTES
+
+        self.shm = None
+        self.owner = create
+        if shm_name is None and not create:
+            self.table = array("Q", bytes(size))
+        else:
+            self.shm = shared_memory.SharedMemory(name=shm_name, create=create, size=size if create else 0)
+            if create:
+                self.shm.buf[:size] = bytes(size)
+            self.table = self.shm.buf[:size].cast("Q")
+
+        # increased for every new search, so entries of old searches can be replaced first
+        self.generation = 0
+
+        # statistics
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+
+    @classmethod
+    def create_shared(cls, size_mb: int = 16) -> "TranspositionTable":
+        """
+        creates a table in a new shared memory block. Other processes attach to it by name
+        (see attach), the creator has to close() it at the end
+        """
+        return cls(size_mb, create=True)
+
+
+    @classmethod
+    def attach(cls, size_mb: int, shm_name: str) -> "TranspositionTable":
+        """
+        attaches to a table made by create_shared. Meant for processes started by multiprocessing,
+        they share the resource tracker of the creator, which removes the block if it crashes
+        """
+        return cls(size_mb, shm_name=shm_name)
+
+
+    @property
+    def shm_name(self) -> str | None:
+        return self.shm.name if self.shm is not None else None
+
+
+    def close(self) -> None:
+        """
+        releases the shared memory block (and removes it, if this table created it)
+        """
+        if self.shm is None:
+            return
+        self.table.release()
+        self.table = array("Q")
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+
+    def new_search(self) -> None:
+        """
+        has to be called before every new search (ages all existing entries)
+        """
+        self.generation = (self.generation + 1) & GENERATION_MASK
+
+
+    def clear(self) -> None:
+        if self.shm is None:
+            self.table = array("Q", bytes(len(self.table) * 8))
+        else:
+            self.table[:] = array("Q", bytes(len(self.table) * 8))
+        self.generation = 0
+        self.reset_stats()
+
+
+    def reset_stats(self) -> None:
+        self.probes = self.hits = self.stores = 0
+
+
+    def probe(self, key: int) -> None | tuple[int, int, int, int]:
+        """
+        returns (depth, bound, score, move) for the key, or None if the position is not stored
+        """
+        self.probes += 1
+        table = self.table
+        index = (key & self.bucket_mask) * (BUCKET_SLOTS * ENTRY_WORDS)
+
+        for slot in (index, index + ENTRY_WORDS):
+            data = table[slot + 1]
+            if table[slot] ^ data == key and data:
+                self.hits += 1
+                return (
+                    (data >> DEPTH_SHIFT) & 0xFF,
+                    (data >> BOUND_SHIFT) & 0x3,
+                    (data >> SCORE_SHIFT) - SCORE_OFFSET,
+                    data & MOVE_MASK
+                )
+        return None
+
+
+    def store(self, key: int, depth: int, bound: int, score: int, move: int) -> None:
+        """
+        stores a search result. move is a packed move (0 if there is none)
+        """
+        self.stores += 1
+        table = self.table
+        index = (key & self.bucket_mask) * (BUCKET_SLOTS * ENTRY_WORDS)
+
+        data = (
+            (move & MOVE_MASK)
+            | (depth << DEPTH_SHIFT)
+            | (bound << BOUND_SHIFT)
+            | (self.generation << GENERATION_SHIFT)
+            | ((score + SCORE_OFFSET) << SCORE_SHIFT)
+        )
+
+        # depth preferred slot: same position, not deeper than the new result, or left over from an older search
+        old = table[index + 1]
+        same_key = table[index] ^ old == key
+        old_depth = (old >> DEPTH_SHIFT) & 0xFF
+        old_generation = (old >> GENERATION_SHIFT) & GENERATION_MASK
+
+        if same_key and not move:
+            data |= old & MOVE_MASK # keep the best move we already know
+        if not old or same_key or depth >= old_depth or old_generation != self.generation:
+            slot = index
+        else:
+            slot = index + ENTRY_WORDS # always replace slot
+
+        table[slot] = key ^ data
+        table[slot + 1] = data
+
+
+    def hashfull(self) -> int:
+        """
+        permille of the first 1000 entries that are used by the current search (like the uci 'hashfull' info)
+        """
+        table = self.table
+        entries = min(1000, len(table) // ENTRY_WORDS)
+        used = 0
+        for i in range(entries):
+            data = table[i * ENTRY_WORDS + 1]
+            if data and (data >> GENERATION_SHIFT) & GENERATION_MASK == self.generation:
+                used += 1
+        return used * 1000 // entries
+
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+
+    def stats(self) -> dict:
+        return {
+            "size_mb": self.size_mb,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate(),
+            "stores": self.stores,
+            "hashfull": self.hashfull()
+        }
@@ -1,5 +1,6 @@
 from schemas import ChessMove, Coordinate, ChessColor, PromotionPiece
 from schemas import King
+import struct
 import re
 
 # Maps Chess Coordinates (A, B, C or 1, 2, 5...) to an index for our board
@@ -91,6 +92,32 @@ def move_to_long_algebraic(move: ChessMove) -> str:
 
 
 
+def find_records(data, record: struct.Struct, key: int, offset: int = 0, count: int | None = None) -> list[tuple]:
+    """
+    all records with the given key in a file of fixed size records sorted by their first field (the key),
+    like Polyglot books and position indexes. 'data' holds the file (e.g. a mmap), the records start at
+    'offset'. Binary search for the first one, returns them in file order
+    """
+    if count is None:
+        count = (len(data) - offset) // record.size
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if record.unpack_from(data, offset + middle * record.size)[0] < key:
+            low = middle + 1
+        else:
+            high = middle
+
+    found = []
+    for index in range(low, count):
+        entry = record.unpack_from(data, offset + index * record.size)
+        if entry[0] != key:
+            break
+        found.append(entry)
+    return found
+
+
+
 def validate_move(move: str) -> None:
        MOVE_REGEX = re.compile("^[a-h][1-8][-x][a-h][1-8](?:=[QNBK])?$")
        if not MOVE_REGEX.match(move):
@@ -0,0 +1,51 @@
+from bitboards import WHITE
+import random
+
+"""
+This File holds the random keys for Zobrist hashing.
+https://www.chessprogramming.org/Zobrist_Hashing
+
+A position's hash is the XOR of the keys of everything in it (pieces on squares,
+side to move, castling rights, en passant file). Position keeps its hash up to date
+incrementally in move() / undo_move(). compute_hash() is the slow full recomputation
+used when a position is set up and for debugging.
+"""
+
+# fixed seed, so hashes are the same in every run (and in every process)
+_rng = random.Random(0x5EED_C0DE)
+
+# piece_keys[piece_code][square]
+piece_keys = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+
+# XORed in when black is to move
+side_key = _rng.getrandbits(64)
+
+# one key per castling right, combined into one key for each of the 16 possible castling_rights values
+_castling_right_keys = [_rng.getrandbits(64) for _ in range(4)]
+castling_keys = [0] * 16
+for _rights in range(16):
+    for _bit in range(4):
+        if _rights & (1 << _bit):
+            castling_keys[_rights] ^= _castling_right_keys[_bit]
+
+# one key per file of the en passant square
+en_passant_keys = [_rng.getrandbits(64) for _ in range(8)]
+
+
+def compute_hash(position) -> int:
+    """
+    computes the hash of a position from scratch
+    """
+    h = 0
+    for square, piece in enumerate(position.squares):
+        if piece is not None:
+            h ^= piece_keys[piece][square]
+
+    if position.turn.value != WHITE:
+        h ^= side_key
+
+    h ^= castling_keys[position.castling_rights]
+
+    if position.en_passant_square is not None:
+        h ^= en_passant_keys[position.en_passant_square & 7]
+    return h